@@ -0,0 +1,314 @@
+"""
+Time how long mktheapidocs takes to document synthetic packages of different
+sizes.
+
+Each size is measured in a fresh interpreter, against a package generated by
+`synthetic.generate_package`. The in-memory signature and docstring caches are
+emptied before every run, so the timings are those of a fresh build. Results
+are written as JSON, and can be compared with those of an earlier version
+with `--compare`.
+"""
+
+import concurrent.futures
+import contextlib
+import importlib
+import inspect
+import io
+import json
+import multiprocessing
+import pathlib
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+import click
+
+from synthetic import generate_package
+
+SOURCE_LOCATION = "https://github.com/example/synthetic"
+
+
+def _clear_memos():
+    from mktheapidocs import mkapi
+
+    mkapi.parsed_docstrings.clear()
+    mkapi._formatted_signatures.clear()
+
+
+def _time(func, repeat, setup=_clear_memos):
+    runs = []
+    for run in range(repeat):
+        setup()
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return dict(runs=runs, min=min(runs), median=statistics.median(runs))
+
+
+def _documented_objects(modules):
+    """Everything `doc_module` passes to `to_doc` for some modules."""
+    from mktheapidocs import mkapi
+
+    objects = []
+    for module in modules:
+        objects.append((module.__name__, module))
+        members = mkapi.get_module_members(module)
+        for name, cls in sorted(members.enums) + sorted(members.classes):
+            objects.append((name, cls))
+            objects += mkapi.get_class_methods(cls)
+        objects += sorted(members.funcs)
+    return objects
+
+
+def _plugin_build(package_name, site_dir):
+    from mktheapidocs import plugin
+
+    # Forget anything kept from previous builds, as `mkdocs build` would
+    plugin._reloaders.clear()
+    plugin._rendered.clear()
+    plugin._page_files.clear()
+    docs_plugin = plugin.Plugin()
+    errors, warnings = docs_plugin.load_config(
+        {"modules": {package_name: {"section": "api", "source_repo": SOURCE_LOCATION}}}
+    )
+    config = dict(site_dir=str(site_dir), nav=None, config_file_path=None)
+    docs_plugin.on_config(config)
+    for f in docs_plugin.on_files([]):
+        docs_plugin.on_page_read_source(types.SimpleNamespace(url=f.url, file=f))
+
+
+def measure(size, repeat, package_options):
+    """
+    Time each stage of documenting a synthetic package.
+
+    Parameters
+    ----------
+    size : int
+        Number of modules in the package
+    repeat : int
+        Number of times to run each benchmark
+    package_options : dict
+        Other arguments to `generate_package`
+
+    Returns
+    -------
+    dict
+        Timings of each benchmark, in seconds
+    """
+    from mktheapidocs import mkapi
+
+    package_name = f"synthetic{size}"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = pathlib.Path(tmp_dir)
+        generate_package(tmp_dir / "src", package_name, modules=size, **package_options)
+        sys.path.insert(0, str(tmp_dir / "src"))
+        package = importlib.import_module(package_name)
+        results = {}
+        # The first call imports every module, so is timed on its own
+        results["get_submodule_files (importing)"] = _time(
+            lambda: mkapi.get_submodule_files(package), 1
+        )
+        results["get_submodule_files"] = _time(
+            lambda: mkapi.get_submodule_files(package), repeat
+        )
+        submodules = mkapi.get_submodule_files(package)
+        modules = [module for module, file in submodules]
+
+        def doc_modules():
+            for module, file in submodules:
+                mkapi.doc_module(
+                    module.__name__,
+                    module,
+                    tmp_dir / "docs",
+                    SOURCE_LOCATION,
+                    file.stem != "__init__",
+                )
+
+        results["doc_module"] = _time(doc_modules, repeat)
+
+        objects = _documented_objects(modules)
+
+        def format_signatures():
+            # doc_module formats each module's signatures in one batch before
+            # calling to_doc, so do the same rather than timing black here
+            _clear_memos()
+            mkapi.format_signatures(
+                func_sig
+                for func_sig in (
+                    mkapi._signature_text(name, thing)
+                    for name, thing in objects
+                    if not isinstance(thing, property)
+                )
+                if func_sig is not None
+            )
+
+        def to_doc():
+            for name, thing in objects:
+                mkapi.to_doc(name, thing, 2, SOURCE_LOCATION)
+
+        results["to_doc"] = _time(to_doc, repeat, setup=format_signatures)
+
+        records = []
+
+        def extract_modules():
+            records[:] = [
+                mkapi.extract_module(module.__name__, module) for module in modules
+            ]
+
+        def render_modules():
+            for record in records:
+                mkapi.render_module(record, SOURCE_LOCATION)
+
+        results["extract_module"] = _time(extract_modules, repeat)
+        results["render_module"] = _time(render_modules, repeat, setup=lambda: None)
+
+        documented = []
+        type_strings = []
+        for name, thing in objects:
+            docstring = inspect.getdoc(thing)
+            if docstring is None:
+                continue
+            doc = mkapi.parsed_docstrings.parse(docstring)
+            try:
+                signature = inspect.signature(thing)
+            except (TypeError, ValueError):
+                continue
+            documented.append((signature, doc["Parameters"]))
+            for section in ("Parameters", "Returns"):
+                type_strings += [
+                    type_string
+                    for names, type_string, description in doc[section]
+                    if type_string
+                ]
+
+        def mangle_types():
+            for type_string in type_strings:
+                mkapi.mangle_types(type_string)
+
+        def type_list():
+            for signature, params in documented:
+                mkapi.type_list(signature, params, "## Parameters\n")
+
+        results["mangle_types"] = _time(mangle_types, repeat)
+        results["type_list"] = _time(type_list, repeat)
+
+        def make_api_doc():
+            with contextlib.redirect_stdout(io.StringIO()):
+                mkapi.make_api_doc(package_name, tmp_dir / "api", SOURCE_LOCATION)
+
+        results["make_api_doc"] = _time(make_api_doc, repeat)
+        results["Plugin.on_config + on_page_read_source"] = _time(
+            lambda: _plugin_build(package_name, tmp_dir / "site"), repeat
+        )
+    return dict(
+        modules=size,
+        objects=len(objects),
+        docstring_types=len(type_strings),
+        benchmarks=results,
+    )
+
+
+def compare(old, new):
+    """
+    Print how the fastest run of each benchmark has changed between two sets
+    of results.
+    """
+    old_results = {result["modules"]: result for result in old["results"]}
+    click.echo(f"{old['version']} -> {new['version']}")
+    for result in new["results"]:
+        try:
+            old_benchmarks = old_results[result["modules"]]["benchmarks"]
+        except KeyError:
+            continue
+        click.echo(f"{result['modules']} modules:")
+        for name, timing in result["benchmarks"].items():
+            if name in old_benchmarks:
+                before, after = old_benchmarks[name]["min"], timing["min"]
+                click.echo(
+                    f"  {name}: {before:.4f}s -> {after:.4f}s ({after / before:.2f}x)"
+                )
+
+
+@click.command()
+@click.option(
+    "--size",
+    "sizes",
+    type=click.IntRange(min=1),
+    multiple=True,
+    default=[10, 100, 1000],
+    show_default=True,
+    help="Number of modules in a package, may be given more than once.",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+    help="Number of times to run each benchmark.",
+)
+@click.option("--classes", default=5, show_default=True, help="Classes per module.")
+@click.option("--methods", default=5, show_default=True, help="Methods per class.")
+@click.option(
+    "--properties", default=2, show_default=True, help="Properties per class."
+)
+@click.option("--enums", default=1, show_default=True, help="Enums per module.")
+@click.option("--functions", default=3, show_default=True, help="Functions per module.")
+@click.option(
+    "--richness",
+    type=click.Choice(["rich", "summary", "none"]),
+    default="rich",
+    show_default=True,
+    help="How much of a docstring to give classes, methods and functions.",
+)
+@click.option(
+    "--reexports/--no-reexports",
+    default=True,
+    show_default=True,
+    help="Re-export a class from each module in its package's __init__.py.",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    default="benchmark.json",
+    show_default=True,
+    help="File to write the results to.",
+)
+@click.option(
+    "--compare",
+    "compare_with",
+    type=click.File(),
+    help="Results of an earlier run to compare with.",
+)
+def main(sizes, repeat, output, compare_with, **package_options):
+    from mktheapidocs import __version__
+
+    results = []
+    for size in sizes:
+        # Each size gets a fresh interpreter, so imports and caches are cold
+        with concurrent.futures.ProcessPoolExecutor(
+            1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            result = executor.submit(measure, size, repeat, package_options).result()
+        click.echo(f"{size} modules:")
+        for name, timing in result["benchmarks"].items():
+            click.echo(f"  {name}: {timing['min']:.4f}s")
+        results.append(result)
+    report = dict(
+        version=__version__,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        repeat=repeat,
+        package=package_options,
+        results=results,
+    )
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    if compare_with is not None:
+        compare(json.load(compare_with), report)
+
+
+if __name__ == "__main__":
+    main()
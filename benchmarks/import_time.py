@@ -0,0 +1,85 @@
+"""
+Check how long it takes mkdocs to load the mktheapidocs plugin.
+
+Imports `mktheapidocs.plugin` in a fresh interpreter with `python -X importtime`,
+after importing the parts of mkdocs which will already have been loaded by the
+time mkdocs loads a plugin. Fails if the best of several runs is over the time
+budget, or if the import pulls in any of the dependencies which should only be
+loaded when documentation is actually generated.
+"""
+
+import json
+import re
+import subprocess
+import sys
+
+import click
+
+LAZY_DEPENDENCIES = ("black", "numpydoc", "click")
+
+_IMPORT_PLUGIN = """
+import json, sys
+import mkdocs.config.config_options, mkdocs.plugins, mkdocs.structure.files, mkdocs.utils
+already_imported = set(sys.modules)
+import mktheapidocs.plugin
+print(json.dumps(sorted(set(sys.modules) - already_imported)))
+"""
+
+
+def time_plugin_import():
+    """
+    Import the plugin in a new interpreter.
+
+    Returns
+    -------
+    float, list of str
+        Cumulative import time in milliseconds, and the names of all the
+        modules the import loaded
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _IMPORT_PLUGIN],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = None
+    for line in result.stderr.splitlines():
+        match = re.match(
+            r"import time:\s+\d+ \|\s+(\d+) \| mktheapidocs\.plugin$", line
+        )
+        if match is not None:
+            cumulative = int(match.group(1)) / 1000
+    return cumulative, json.loads(result.stdout)
+
+
+@click.command()
+@click.option(
+    "--budget",
+    type=float,
+    default=100.0,
+    show_default=True,
+    help="Maximum time to import the plugin, in milliseconds.",
+)
+@click.option(
+    "--runs",
+    type=click.IntRange(min=1),
+    default=5,
+    show_default=True,
+    help="Number of times to import, keeping the fastest.",
+)
+def main(budget, runs):
+    timings = []
+    for run in range(runs):
+        cumulative, imported = time_plugin_import()
+        timings.append(cumulative)
+    best = min(timings)
+    click.echo(f"mktheapidocs.plugin imported in {best:.1f} ms (budget {budget} ms)")
+    eager = sorted(name for name in imported if name.split(".")[0] in LAZY_DEPENDENCIES)
+    if eager:
+        click.echo(f"Imported eagerly: {', '.join(eager)}", err=True)
+    if best > budget or eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
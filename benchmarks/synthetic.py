@@ -0,0 +1,222 @@
+"""
+Generate synthetic packages to benchmark mktheapidocs against.
+"""
+
+import pathlib
+import textwrap
+
+_RICH_DOCSTRING = '''
+    """
+    {summary}
+
+    A longer description of {name}, which goes on for a little while
+    and refers to a paper [1]_.
+
+    Parameters
+    ----------
+    {params}
+
+    Returns
+    -------
+    dict of {{str: int}}
+        Something computed from the parameters
+
+    Notes
+    -----
+    Some notes on how {name} works.
+
+    Examples
+    --------
+    >>> {name}(1, "b")
+    {{'a': 1}}
+
+    References
+    ----------
+    .. [1] Someone, "A paper", A Journal, 2018.
+    """
+'''
+
+_SUMMARY_DOCSTRING = '''
+    """
+    {summary}
+    """
+'''
+
+_PARAM_DOC = """{param} : int or None, default None
+        The {param} parameter."""
+
+
+def _docstring(richness, name, params, indent):
+    if richness == "none":
+        return ""
+    template = _RICH_DOCSTRING if richness == "rich" else _SUMMARY_DOCSTRING
+    param_docs = "\n    ".join(_PARAM_DOC.format(param=param) for param in params)
+    docstring = template.format(
+        summary=f"Summary of {name}.", name=name, params=param_docs
+    )
+    return textwrap.indent(textwrap.dedent(docstring).strip("\n"), " " * indent)
+
+
+def _function(name, richness, indent, method=False, annotated=False):
+    params = ["alpha", "beta", "gamma"]
+    args = [
+        f"{param}: int = None" if annotated else f"{param}=None" for param in params
+    ]
+    if method:
+        args.insert(0, "self")
+    returns = " -> dict" if annotated else ""
+    lines = [
+        f"def {name}({', '.join(args)}){returns}:",
+        _docstring(richness, name, params, 4),
+        "    return {}",
+    ]
+    return textwrap.indent("\n".join(line for line in lines if line), " " * indent)
+
+
+def module_source(index, classes, methods, properties, enums, functions, richness):
+    """
+    Source code for one synthetic module.
+
+    Parameters
+    ----------
+    index : int
+        Number of the module, used to make its names unique
+    classes : int
+        Number of classes
+    methods : int
+        Number of methods per class
+    properties : int
+        Number of properties per class
+    enums : int
+        Number of enums
+    functions : int
+        Number of module level functions
+    richness : {'rich', 'summary', 'none'}
+        How much of a docstring to give everything
+
+    Returns
+    -------
+    str
+    """
+    parts = [f'"""\nSynthetic module {index}.\n"""', "import enum"]
+    for enum_ix in range(enums):
+        parts.append(
+            "\n".join(
+                [
+                    f"class Enum{index}_{enum_ix}(enum.Enum):",
+                    _docstring("summary", f"Enum{index}_{enum_ix}", [], 4),
+                    "    FIRST = 1",
+                    '    SECOND = "two"',
+                    "    THIRD = 3.0",
+                ]
+            )
+        )
+    for class_ix in range(classes):
+        name = f"Class{index}_{class_ix}"
+        body = [
+            f"class {name}:",
+            _docstring(richness, name, ["alpha", "beta", "gamma"], 4),
+            _function("__init__", "none", 4, method=True),
+        ]
+        for method_ix in range(methods):
+            body.append(
+                _function(
+                    f"method_{method_ix}",
+                    richness,
+                    4,
+                    method=True,
+                    annotated=method_ix % 2 == 0,
+                )
+            )
+        for property_ix in range(properties):
+            body.append(
+                "\n".join(
+                    [
+                        "    @property",
+                        f"    def property_{property_ix}(self) -> int:",
+                        _docstring("summary", f"property_{property_ix}", [], 8),
+                        "        return 1",
+                    ]
+                )
+            )
+        parts.append("\n\n".join(body))
+    for function_ix in range(functions):
+        parts.append(
+            _function(
+                f"function_{index}_{function_ix}",
+                richness,
+                0,
+                annotated=function_ix % 2 == 0,
+            )
+        )
+    return "\n\n\n".join(parts) + "\n"
+
+
+def generate_package(
+    path,
+    name,
+    modules=10,
+    classes=5,
+    methods=5,
+    properties=2,
+    enums=1,
+    functions=3,
+    richness="rich",
+    reexports=True,
+    modules_per_subpackage=20,
+):
+    """
+    Write a synthetic package to disk.
+
+    Modules are spread over subpackages of at most `modules_per_subpackage`
+    modules each.
+
+    Parameters
+    ----------
+    path : str or Path
+        Directory to create the package in
+    name : str
+        Name of the package
+    modules : int, default 10
+        Number of modules, not counting `__init__.py` files
+    classes : int, default 5
+        Classes per module
+    methods : int, default 5
+        Methods per class
+    properties : int, default 2
+        Properties per class
+    enums : int, default 1
+        Enums per module
+    functions : int, default 3
+        Functions per module
+    richness : {'rich', 'summary', 'none'}
+        How much of a docstring to give classes, methods and functions
+    reexports : bool, default True
+        Whether each subpackage's `__init__.py` re-exports the first class
+        of each of its modules
+    modules_per_subpackage : int, default 20
+        Maximum number of modules in each subpackage
+
+    Returns
+    -------
+    Path
+        Directory of the package
+    """
+    package_dir = pathlib.Path(path) / name
+    package_dir.mkdir(parents=True)
+    (package_dir / "__init__.py").write_text(f'"""\nSynthetic package {name}.\n"""\n')
+    for module_ix in range(modules):
+        subpackage_dir = package_dir / f"sub{module_ix // modules_per_subpackage}"
+        init = subpackage_dir / "__init__.py"
+        if not subpackage_dir.exists():
+            subpackage_dir.mkdir()
+            init.write_text(f'"""\nSynthetic subpackage {subpackage_dir.name}.\n"""\n')
+        (subpackage_dir / f"module{module_ix}.py").write_text(
+            module_source(
+                module_ix, classes, methods, properties, enums, functions, richness
+            )
+        )
+        if reexports and classes > 0:
+            with open(init, "a") as init_file:
+                init_file.write(f"from .module{module_ix} import Class{module_ix}_0\n")
+    return package_dir
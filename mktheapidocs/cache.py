@@ -0,0 +1,351 @@
+"""
+Persistent on-disk cache of rendered module documentation, and a bounded
+in-memory store of it.
+"""
+
+import collections
+import collections.abc
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+
+from . import report
+
+_file_hashes = {}
+
+
+def file_hash(path):
+    """
+    Get the sha256 hash of a file's contents.
+
+    Hashes are remembered for as long as the file's size and modification
+    time are unchanged, so repeated lookups of the same file are cheap.
+
+    Parameters
+    ----------
+    path : str or Path
+        File to hash
+
+    Returns
+    -------
+    str or None
+        Hex digest of the file's contents, or None if it can't be read
+    """
+    path = str(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    try:
+        known_stamp, digest = _file_hashes[path]
+        if known_stamp == stamp:
+            return digest
+    except KeyError:
+        pass
+    with open(path, "rb") as source_file:
+        digest = hashlib.sha256(source_file.read()).hexdigest()
+    _file_hashes[path] = (stamp, digest)
+    return digest
+
+
+@functools.lru_cache(maxsize=None)
+def versions():
+    """
+    Versions of the packages which affect rendered output.
+
+    Returns
+    -------
+    tuple of str
+        mktheapidocs, numpydoc and black versions
+    """
+    import black
+    import numpydoc
+
+    from . import __version__
+
+    return __version__, numpydoc.__version__, black.__version__
+
+
+def _write_atomic(path, text):
+    """Write text to path without ever leaving a partial file behind."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as tmp_file:
+        tmp_file.write(text)
+    os.replace(tmp_path, path)
+
+
+class RenderCache:
+    """
+    Cache of the markdown produced by `doc_module`, stored under `cache_dir`.
+
+    Entries are keyed by the module's name and source file hash, the options
+    used to render it, whether it was read statically, the packages mocked
+    while it was documented, and the versions of mktheapidocs, numpydoc and
+    black. Each entry also records the hashes of every other file the
+    module's documentation was drawn from, and is only used if none of those
+    have changed.
+
+    Parameters
+    ----------
+    cache_dir : str or Path
+        Directory to keep the cache in, created if it doesn't exist
+    static : bool, default False
+        Whether modules are read from their source rather than imported,
+        which can change how they're documented
+    mock_imports : list of str, optional
+        Packages replaced with stand-ins while modules are documented
+    """
+
+    def __init__(self, cache_dir, static=False, mock_imports=()):
+        self.cache_dir = pathlib.Path(cache_dir).expanduser().absolute()
+        self.static = static
+        self.mock_imports = sorted(set(mock_imports))
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, module_name, name, source_file, source_location, leaf):
+        try:
+            source_hash = file_hash(source_file)
+        except TypeError:
+            source_hash = None
+        if source_hash is None:
+            return None
+        key = json.dumps(
+            [
+                versions(),
+                module_name,
+                name,
+                source_location,
+                leaf,
+                self.static,
+                self.mock_imports,
+                source_hash,
+            ]
+        )
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.cache_dir / "render" / digest[:2] / f"{digest}.json"
+
+    def lookup(self, module_name, name, source_file, source_location, leaf):
+        """
+        Look for an up to date entry for a module, without needing to import
+        it, and without counting a hit or miss.
+
+        Parameters
+        ----------
+        module_name : str
+        name : str
+            Full name of the module
+        source_file : str or Path
+            The module's source file
+        source_location : str
+        leaf : bool
+
+        Returns
+        -------
+        tuple of str, set of str or None
+            The cached markdown and the source files it was drawn from, or
+            None if there isn't an up to date entry
+        """
+        entry_path = self._entry_path(
+            module_name, name, source_file, source_location, leaf
+        )
+        try:
+            with open(entry_path) as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, TypeError, ValueError):
+            return None
+        for dependency, dependency_hash in entry["dependencies"].items():
+            if file_hash(dependency) != dependency_hash:
+                return None
+        return entry["markdown"], set(entry["dependencies"])
+
+    def get(self, module_name, module, source_location, leaf):
+        """
+        Get the cached markdown for a module.
+
+        Parameters
+        ----------
+        module_name : str
+        module : module
+        source_location : str
+        leaf : bool
+
+        Returns
+        -------
+        tuple of str, set of str or None
+            The cached markdown and the source files it was drawn from, or
+            None if there isn't an up to date entry
+        """
+        cached = self.lookup(
+            module_name,
+            module.__name__,
+            getattr(module, "__file__", None),
+            source_location,
+            leaf,
+        )
+        if cached is None:
+            self.misses += 1
+            report.count("render_cache_misses")
+        else:
+            self.hits += 1
+            report.count("render_cache_hits")
+        return cached
+
+    def put(self, module_name, module, source_location, leaf, markdown, dependencies):
+        """
+        Store the markdown for a module.
+
+        Parameters
+        ----------
+        module_name : str
+        module : module
+        source_location : str
+        leaf : bool
+        markdown : str
+            Rendered documentation
+        dependencies : iterable of str
+            Source files the documentation was drawn from
+        """
+        entry_path = self._entry_path(
+            module_name,
+            module.__name__,
+            getattr(module, "__file__", None),
+            source_location,
+            leaf,
+        )
+        if entry_path is None:
+            return
+        entry = dict(
+            module=module.__name__,
+            dependencies={
+                str(dependency): file_hash(dependency)
+                for dependency in sorted(dependencies)
+            },
+            markdown=markdown,
+        )
+        _write_atomic(entry_path, json.dumps(entry))
+
+    def load_memo(self, name):
+        """
+        Load entries saved with `save_memo`.
+
+        Parameters
+        ----------
+        name : str
+            Name the entries were saved under
+
+        Returns
+        -------
+        list
+            The entries, or an empty list if there are none for the current
+            package versions
+        """
+        try:
+            with open(self.cache_dir / f"{name}.json") as memo_file:
+                memo = json.load(memo_file)
+        except (OSError, ValueError):
+            return []
+        if memo["versions"] != list(versions()):
+            return []
+        return memo["entries"]
+
+    def save_memo(self, name, entries):
+        """
+        Save a list of JSON serialisable entries, such as the contents of an
+        in-memory cache, to be shared with later builds.
+
+        Parameters
+        ----------
+        name : str
+            Name to save the entries under
+        entries : list
+            Entries to save
+        """
+        memo = dict(versions=versions(), entries=entries)
+        _write_atomic(self.cache_dir / f"{name}.json", json.dumps(memo))
+
+
+class MarkdownStore(collections.abc.MutableMapping):
+    """
+    Mapping of keys to rendered markdown which keeps no more than a budget of
+    bytes in memory. The least recently used pages over the budget are moved
+    to a temporary directory, and read back when they're next needed. Pages
+    can be stored and read from several threads at once.
+
+    Parameters
+    ----------
+    budget : int
+        Maximum size, in bytes, of the markdown to keep in memory
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.bytes = 0
+        self._memory = collections.OrderedDict()
+        self._spilled = {}
+        self._spill_dir = tempfile.TemporaryDirectory(prefix="mktheapidocs-")
+        self._lock = threading.RLock()
+
+    def _spill_path(self, key):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return pathlib.Path(self._spill_dir.name) / f"{digest}.md"
+
+    def __getitem__(self, key):
+        with self._lock:
+            try:
+                markdown, size = self._memory[key]
+                self._memory.move_to_end(key)
+                return markdown
+            except KeyError:
+                pass
+            markdown = self._spilled[key].read_text(encoding="utf-8")
+            self[key] = markdown
+            return markdown
+
+    def __setitem__(self, key, markdown):
+        size = len(markdown.encode())
+        with self._lock:
+            self._discard(key)
+            self._memory[key] = markdown, size
+            self.bytes += size
+            while self.bytes > self.budget and self._memory:
+                spill_key, (spill_markdown, spill_size) = self._memory.popitem(
+                    last=False
+                )
+                self.bytes -= spill_size
+                spill_path = self._spill_path(spill_key)
+                spill_path.write_text(spill_markdown, encoding="utf-8")
+                self._spilled[spill_key] = spill_path
+
+    def _discard(self, key):
+        try:
+            markdown, size = self._memory.pop(key)
+            self.bytes -= size
+        except KeyError:
+            pass
+        spill_path = self._spilled.pop(key, None)
+        if spill_path is not None:
+            spill_path.unlink(missing_ok=True)
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key not in self:
+                raise KeyError(key)
+            self._discard(key)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._memory or key in self._spilled
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._memory) + list(self._spilled))
+
+    def __len__(self):
+        return len(self._memory) + len(self._spilled)
@@ -0,0 +1,285 @@
+"""
+Command line interface for mktheapidocs.
+"""
+
+import click
+
+from . import shard
+from .daemon import DaemonError, request, serve
+from .mkapi import DUMP_FORMATS, dump_api, make_api_doc, merge_shards
+
+
+class DefaultGroup(click.Group):
+    """
+    Group of commands which runs `build` unless it's given the name of
+    another, so `mktheapidocs MODULE_NAME OUTPUT_DIR SOURCE_LOCATION` works
+    as it always has.
+    """
+
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] != "--help":
+            args = ["build"] + args
+        return super().parse_args(ctx, args)
+
+
+class ShardType(click.ParamType):
+    """
+    A shard, given as `i/N` for the `i`th of `N` shards, counting from 1.
+    """
+
+    name = "i/N"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, tuple):
+            return value
+        try:
+            number, shards = (int(part) for part in value.split("/"))
+        except ValueError:
+            self.fail(f"{value!r} isn't of the form i/N.", param, ctx)
+        if not 1 <= number <= shards:
+            self.fail(f"{value!r} isn't one of shards 1 to {shards}.", param, ctx)
+        return number, shards
+
+
+@click.group(cls=DefaultGroup)
+def cli():
+    """
+    Generate markdown API documentation from numpydoc docstrings.
+    """
+
+
+@cli.command()
+@click.argument("module_name")
+@click.argument("output_dir")
+@click.argument("source-location")
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Reuse documentation for unchanged modules from this directory.",
+)
+@click.option(
+    "--static",
+    is_flag=True,
+    help="Read the package's source instead of importing it.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of processes to document modules with.",
+)
+@click.option(
+    "--stats",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Keep how long each module takes to document in this file, to share "
+    "modules between processes by. Defaults to stats.json in --cache-dir.",
+)
+@click.option(
+    "--report",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write a JSON report of where the build's time went to this file.",
+)
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write a Chrome trace of the build to this file.",
+)
+@click.option(
+    "--mock-import",
+    "mock_imports",
+    multiple=True,
+    help="Replace this package with a stand-in instead of importing it. "
+    "May be given more than once.",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Seconds to allow for importing and documenting each module, "
+    "which is done in a separate process.",
+)
+@click.option(
+    "--memory-limit",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Bytes of memory to allow for importing and documenting each module, "
+    "which is done in a separate process.",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(("markdown",) + DUMP_FORMATS),
+    default="markdown",
+    show_default=True,
+    help="Write markdown pages to the OUTPUT_DIR directory, or a record of "
+    "each module, class, function and enum to the file OUTPUT_DIR (- for "
+    "standard output) as JSON lines or msgpack.",
+)
+@click.option(
+    "--shard",
+    "shard_of",
+    type=ShardType(),
+    default=None,
+    help="Only document the i-th of N shards of the package's modules, and "
+    "write a shard manifest for `mktheapidocs merge`.",
+)
+@click.option(
+    "--weights",
+    type=click.Path(exists=True, dir_okay=False),
+    multiple=True,
+    help="Shard manifest or report of an earlier build, to balance the shards "
+    "by how long each module took. May be given more than once.",
+)
+def build(
+    module_name,
+    output_dir,
+    source_location,
+    cache_dir,
+    static,
+    jobs,
+    stats,
+    report,
+    trace,
+    mock_imports,
+    timeout,
+    memory_limit,
+    output_format,
+    shard_of,
+    weights,
+):
+    """
+    Document the package MODULE_NAME in OUTPUT_DIR.
+
+    Pages link to the package's source at SOURCE_LOCATION.
+    """
+    if weights and shard_of is None:
+        raise click.UsageError("--weights only applies with --shard.")
+    if output_format != "markdown":
+        if cache_dir is not None:
+            raise click.UsageError("--cache-dir only applies to markdown output.")
+        if shard_of is not None:
+            raise click.UsageError("--shard only applies to markdown output.")
+        dump_api(
+            module_name,
+            output_dir,
+            source_location,
+            output_format=output_format,
+            static=static,
+            jobs=jobs,
+            report_path=report,
+            trace_path=trace,
+            mock_imports=mock_imports,
+            timeout=timeout,
+            memory_limit=memory_limit,
+        )
+        return
+    make_api_doc(
+        module_name,
+        output_dir,
+        source_location,
+        cache_dir=cache_dir,
+        static=static,
+        jobs=jobs,
+        report_path=report,
+        trace_path=trace,
+        mock_imports=mock_imports,
+        timeout=timeout,
+        memory_limit=memory_limit,
+        shard_of=shard_of,
+        weights=shard.load_weights(weights),
+        stats_path=stats,
+    )
+
+
+@cli.command()
+@click.argument("output_dir")
+@click.argument("shard_dirs", nargs=-1, required=True)
+@click.option(
+    "--report",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write the shards' combined build reports to this file, which can be "
+    "given to --weights for the next build.",
+)
+def merge(output_dir, shard_dirs, report):
+    """
+    Merge the documentation built by shards.
+
+    Puts the documentation built by every shard, in SHARD_DIRS, together in
+    OUTPUT_DIR, as a single build would have written it.
+    """
+    try:
+        merge_shards(output_dir, shard_dirs, report_path=report)
+    except (OSError, ValueError) as error:
+        raise click.ClickException(str(error))
+
+
+@cli.command()
+@click.argument("socket_path")
+@click.argument("module_names", nargs=-1, required=True)
+@click.option(
+    "--mock-import",
+    "mock_imports",
+    multiple=True,
+    help="Replace this package with a stand-in instead of importing it. "
+    "May be given more than once.",
+)
+def daemon(socket_path, module_names, mock_imports):
+    """
+    Keep packages imported, and document them on request.
+
+    Imports the packages MODULE_NAMES, and answers requests for the
+    documentation of their modules and objects on the Unix socket
+    SOCKET_PATH, reloading modules whose source has changed.
+    """
+    try:
+        serve(socket_path, module_names, mock_imports)
+    except DaemonError as error:
+        raise click.ClickException(str(error))
+
+
+@cli.command()
+@click.argument("socket_path")
+@click.argument("op", type=click.Choice(["module", "object", "ping", "shutdown"]))
+@click.argument("name", required=False)
+@click.option(
+    "--source-location",
+    default="",
+    help="URL of the source code to link to.",
+)
+@click.option(
+    "--header-level",
+    type=click.IntRange(min=1, max=6),
+    default=2,
+    show_default=True,
+    help="Heading level to document an object at.",
+)
+def client(socket_path, op, name, source_location, header_level):
+    """
+    Ask a daemon for documentation.
+
+    Prints the markdown for the module or object NAME from the daemon
+    listening on SOCKET_PATH, or checks it's running with `ping`, or stops
+    it with `shutdown`.
+    """
+    if op in ("module", "object") and name is None:
+        raise click.UsageError(f"NAME is needed to ask for an {op}.")
+    try:
+        response = request(
+            socket_path,
+            op,
+            name=name,
+            source_location=source_location,
+            header_level=header_level,
+        )
+    except (OSError, DaemonError) as error:
+        raise click.ClickException(str(error))
+    if op == "ping":
+        click.echo(f"Documenting {', '.join(response['packages'])}")
+    elif op != "shutdown":
+        click.echo(response["markdown"], nl=False)
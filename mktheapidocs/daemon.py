@@ -0,0 +1,315 @@
+"""
+Keep packages imported between requests for their documentation.
+
+Importing a large package can take far longer than documenting any one of
+its modules, so editors and previews which want one page at a time are
+better served by a long-lived process. `serve` imports the packages once,
+then answers requests on a Unix socket. Before each request, modules whose
+source has changed are reloaded, along with the modules which import from
+them, and only documentation drawn from changed files is rendered again.
+
+Requests and responses are lines of JSON. A request has an `op`:
+
+- `module`: markdown for the module `name`, as its page would have it
+- `object`: markdown for the class, function or other object `name`,
+  given by its full dotted name, with headings at `header_level`
+- `ping`: the packages being documented
+- `shutdown`: stop the daemon
+
+`module` and `object` requests may give the `source_location` to link to.
+Responses have `ok`, and then either the `markdown` and the source `files`
+it was drawn from, or the `error`.
+"""
+
+import importlib
+import json
+import pathlib
+import socket
+import socketserver
+import threading
+
+from . import mkapi, mock
+from .reloader import ModuleReloader
+
+# Seconds to wait for anything already listening on a socket to answer
+PING_TIMEOUT = 5
+
+
+class DaemonError(Exception):
+    """
+    The daemon couldn't answer a request.
+    """
+
+
+class Daemon:
+    """
+    Documentation of some packages, kept in step with their source.
+
+    Parameters
+    ----------
+    packages : list of str
+        Packages to import, and document on request
+    mock_imports : list of str, optional
+        Packages to replace with stand-ins while importing and documenting
+    """
+
+    def __init__(self, packages, mock_imports=()):
+        self.packages = list(packages)
+        self.mock_imports = list(mock_imports)
+        self.reloaders = [ModuleReloader(package) for package in self.packages]
+        self.rendered = {}
+        self.lock = threading.Lock()
+        # Import everything now, rather than while answering the first request
+        importlib.import_module("black")
+        importlib.import_module("numpydoc.docscrape")
+        with mock.mocked(self.mock_imports):
+            for package in self.packages:
+                mkapi.get_submodule_files(importlib.import_module(package))
+        for reloader in self.reloaders:
+            reloader.track()
+
+    def refresh(self):
+        """
+        Reload modules whose source has changed, and forget documentation
+        drawn from them.
+        """
+        changed_files = set()
+        for reloader in self.reloaders:
+            reloader.refresh()
+            changed_files |= reloader.changed_files
+        if changed_files:
+            self.rendered = {
+                key: (markdown, files)
+                for key, (markdown, files) in self.rendered.items()
+                if files.isdisjoint(changed_files)
+            }
+
+    def _find(self, name):
+        parts = name.split(".")
+        for ix in range(len(parts), 0, -1):
+            try:
+                thing = importlib.import_module(".".join(parts[:ix]))
+            except ModuleNotFoundError:
+                continue
+            try:
+                for part in parts[ix:]:
+                    thing = getattr(thing, part)
+            except AttributeError:
+                break
+            return thing
+        raise DaemonError(f"Couldn't find {name}")
+
+    def render_module(self, name, source_location):
+        """
+        Get the markdown for a module's page.
+
+        Parameters
+        ----------
+        name : str
+            Full name of the module
+        source_location : str
+            URL of repo containing source code
+
+        Returns
+        -------
+        str, frozenset of str
+            The markdown, and the source files it was drawn from
+        """
+        key = ("module", name, source_location)
+        if key not in self.rendered:
+            module = importlib.import_module(name)
+            with mkapi.recording_sources({module.__file__}) as files:
+                markdown = mkapi.render_module(
+                    mkapi.extract_module(name, module), source_location
+                )
+            files.discard(None)
+            self.rendered[key] = markdown, frozenset(files)
+        return self.rendered[key]
+
+    def render_object(self, name, source_location, header_level=2):
+        """
+        Get the markdown for a module, class, enum or function.
+
+        Parameters
+        ----------
+        name : str
+            Full dotted name of the object
+        source_location : str
+            URL of repo containing source code
+        header_level : int, default 2
+            Heading level
+
+        Returns
+        -------
+        str, frozenset of str
+            The markdown, and the source files it was drawn from
+        """
+        key = ("object", name, source_location, header_level)
+        if key not in self.rendered:
+            thing = self._find(name)
+            with mkapi.recording_sources(set()) as files:
+                markdown = "".join(
+                    mkapi.to_doc(
+                        name.split(".")[-1], thing, header_level, source_location
+                    )
+                )
+            files.discard(None)
+            self.rendered[key] = markdown, frozenset(files)
+        return self.rendered[key]
+
+    def handle(self, request):
+        """
+        Answer a request.
+
+        Parameters
+        ----------
+        request : dict
+            Request, as described for the module
+
+        Returns
+        -------
+        dict
+            Response, as described for the module
+        """
+        op = request.get("op")
+        if op == "ping":
+            return dict(ok=True, packages=self.packages)
+        if op not in ("module", "object"):
+            raise DaemonError(f"Unknown request {op!r}")
+        name = request.get("name") or ""
+        if not any(
+            name == package or name.startswith(f"{package}.")
+            for package in self.packages
+        ):
+            raise DaemonError(f"{name} isn't in {', '.join(self.packages)}")
+        source_location = request.get("source_location", "")
+        with self.lock, mock.mocked(self.mock_imports):
+            self.refresh()
+            if op == "module":
+                markdown, files = self.render_module(name, source_location)
+            else:
+                markdown, files = self.render_object(
+                    name, source_location, request.get("header_level", 2)
+                )
+            for reloader in self.reloaders:
+                # Watch any modules imported to answer the request too
+                reloader.track()
+        return dict(ok=True, markdown=markdown, files=sorted(files))
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            shutdown = False
+            try:
+                request = json.loads(line)
+                shutdown = request.get("op") == "shutdown"
+                response = (
+                    dict(ok=True) if shutdown else self.server.docs.handle(request)
+                )
+            except DaemonError as error:
+                response = dict(ok=False, error=str(error))
+            except Exception as error:
+                response = dict(ok=False, error=f"{type(error).__name__}: {error}")
+            self.wfile.write((json.dumps(response) + "\n").encode())
+            self.wfile.flush()
+            if shutdown:
+                # From another thread, as shutdown waits for this one's server
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path, packages, mock_imports=()):
+    """
+    Import packages, and answer requests for their documentation on a Unix
+    socket until asked to shut down.
+
+    Parameters
+    ----------
+    socket_path : str or Path
+        Socket to listen on
+    packages : list of str
+        Packages to document
+    mock_imports : list of str, optional
+        Packages to replace with stand-ins while importing and documenting
+
+    Raises
+    ------
+    DaemonError
+        If another daemon, or anything else, is already listening on the
+        socket
+    """
+    socket_path = pathlib.Path(socket_path)
+    if socket_path.exists():
+        try:
+            request(socket_path, "ping", timeout=PING_TIMEOUT)
+        except socket.timeout:
+            raise DaemonError(f"Something unresponsive is listening on {socket_path}")
+        except OSError:
+            # Left behind by a daemon which didn't get to shut down
+            socket_path.unlink()
+        except DaemonError:
+            raise DaemonError(
+                f"Something other than a daemon is listening on {socket_path}"
+            )
+        else:
+            raise DaemonError(f"A daemon is already listening on {socket_path}")
+    docs = Daemon(packages, mock_imports)
+    with _Server(str(socket_path), _Handler) as server:
+        server.docs = docs
+        print(f"Documenting {', '.join(packages)} on {socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+
+def request(socket_path, op, timeout=None, **params):
+    """
+    Send a request to a daemon, and wait for its response.
+
+    Parameters
+    ----------
+    socket_path : str or Path
+        Socket the daemon is listening on
+    op : {'module', 'object', 'ping', 'shutdown'}
+        What to ask for
+    timeout : float, optional
+        Seconds to wait for the daemon
+    **params
+        Rest of the request, such as the `name` of the module or object
+
+    Returns
+    -------
+    dict
+        Response
+
+    Raises
+    ------
+    DaemonError
+        If the daemon couldn't answer the request, or what answered wasn't
+        a daemon
+    OSError
+        If the daemon couldn't be reached, or didn't answer in time
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(str(socket_path))
+        with connection.makefile("rwb") as stream:
+            stream.write((json.dumps(dict(params, op=op)) + "\n").encode())
+            stream.flush()
+            line = stream.readline()
+    if not line:
+        raise DaemonError("The daemon closed the connection")
+    try:
+        response = json.loads(line)
+        ok = response["ok"]
+    except (ValueError, TypeError, KeyError):
+        raise DaemonError(f"Not a response from a daemon: {line[:80]!r}")
+    if not ok:
+        raise DaemonError(response["error"])
+    return response
@@ -0,0 +1,327 @@
+"""
+Intermediate representation of the documentation of a module.
+
+Documenting a module happens in two stages. Extraction
+(`mkapi.extract_module`, `mkapi.extract_object`) is the only stage which
+looks at the live module, classes and functions, and boils them down to the
+records here: names, signature text, annotations as strings, parsed
+docstring sections and source lines. Rendering (`mkapi.render_module`,
+`mkapi.render_object`) turns records into markdown without introspecting
+anything, so records can be cached, sent between processes and rendered
+long after the module has gone.
+
+Records are `__slots__` objects which `dump` to nested lists of plain
+values, and are rebuilt from them with `load`, so they can be stored with
+JSON, msgpack or pickle. `flatten` gives a module's records one object at a
+time as dicts, for tools which read the API a record at a time.
+"""
+
+
+class Record:
+    """
+    Base class for records, whose fields are their `__slots__`, and can be
+    given positionally or by name.
+    """
+
+    __slots__ = ()
+    # Fields which hold a record, or a list of records, rather than plain data
+    _records = ()
+
+    def __init__(self, *args, **kwargs):
+        if len(args) > len(self.__slots__):
+            raise TypeError(f"{type(self).__name__} takes {len(self.__slots__)} fields")
+        values = dict(zip(self.__slots__, args), **kwargs)
+        unknown = values.keys() - set(self.__slots__)
+        if unknown:
+            raise TypeError(f"Unknown fields for {type(self).__name__}: {unknown}")
+        for field in self.__slots__:
+            try:
+                setattr(self, field, values[field])
+            except KeyError:
+                raise TypeError(f"Missing field {field} for {type(self).__name__}")
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(
+            getattr(self, field) == getattr(other, field) for field in self.__slots__
+        )
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{field}={getattr(self, field)!r}" for field in self.__slots__
+        )
+        return f"{type(self).__name__}({fields})"
+
+    def dump(self):
+        """
+        Get the record as nested lists of plain values.
+
+        Returns
+        -------
+        list
+            Name of the record's type, followed by its fields
+        """
+        return [type(self).__name__] + [
+            (
+                _dump(getattr(self, field))
+                if field in self._records
+                else getattr(self, field)
+            )
+            for field in self.__slots__
+        ]
+
+    def as_dict(self):
+        """
+        Get the record as a dict of plain values, keyed by field name.
+
+        Returns
+        -------
+        dict
+            The record's fields, and its `kind`: the name of its type in
+            lower case
+        """
+        data = dict(kind=type(self).__name__.lower())
+        for field in self.__slots__:
+            value = getattr(self, field)
+            if field in self._records and value is not None:
+                value = (
+                    value.as_dict()
+                    if isinstance(value, Record)
+                    else [record.as_dict() for record in value]
+                )
+            data[field] = value
+        return data
+
+
+def _dump(value):
+    if value is None:
+        return None
+    if isinstance(value, Record):
+        return value.dump()
+    return [record.dump() for record in value]
+
+
+def _load(value):
+    if value is None:
+        return None
+    if value and isinstance(value[0], str):
+        return load(value)
+    return [load(record) for record in value]
+
+
+def load(data):
+    """
+    Rebuild a record from `Record.dump`.
+
+    Parameters
+    ----------
+    data : list
+        Dumped record
+
+    Returns
+    -------
+    Record
+    """
+    cls = _KINDS[data[0]]
+    values = list(data[1:])
+    for ix, field in enumerate(cls.__slots__):
+        if field in cls._records:
+            values[ix] = _load(values[ix])
+    return cls(*values)
+
+
+class Parameter(Record):
+    """
+    A parameter of a function or class.
+
+    Attributes
+    ----------
+    name : str
+    annotation : str or None
+        Annotation as text, or None if the parameter isn't annotated
+    default : str or None
+        Default value as text, or None if there isn't one
+    """
+
+    __slots__ = ("name", "annotation", "default")
+
+
+class Return(Record):
+    """
+    What a function returns.
+
+    Attributes
+    ----------
+    annotation : str
+        Return annotation as text, or an empty string if there isn't one
+    """
+
+    __slots__ = ("annotation",)
+
+
+class Function(Record):
+    """
+    A function, method or property.
+
+    Attributes
+    ----------
+    name : str
+        Name it is documented under
+    signature : str or None
+        Signature, before formatting, or None if it doesn't have one
+    is_property : bool
+    file : str or None
+        Source file, relative to the root of the source repo, or None if it
+        couldn't be found
+    line : int or None
+        Line it is defined on in `file`
+    doc : dict or None
+        Docstring sections parsed by numpydoc, or None if it has no docstring
+    parameters : list of Parameter or None
+        Parameters, or None if its signature couldn't be read
+    returns : Return or None
+        Return annotation, or None if it couldn't be read
+    """
+
+    __slots__ = (
+        "name",
+        "signature",
+        "is_property",
+        "file",
+        "line",
+        "doc",
+        "parameters",
+        "returns",
+    )
+    _records = ("parameters", "returns")
+
+
+class Class(Record):
+    """
+    A class.
+
+    Attributes
+    ----------
+    name : str
+    signature : str or None
+    file : str or None
+    line : int or None
+    doc : dict or None
+    parameters : list of Parameter or None
+        Parameters of the class's constructor
+    returns : Return or None
+    properties : list of str
+        Names of its properties, including inherited ones
+    methods : list of Function
+        Methods and properties documented with it
+    """
+
+    __slots__ = (
+        "name",
+        "signature",
+        "file",
+        "line",
+        "doc",
+        "parameters",
+        "returns",
+        "properties",
+        "methods",
+    )
+    _records = ("parameters", "returns", "methods")
+
+
+class Enum(Record):
+    """
+    An enum.
+
+    Attributes
+    ----------
+    name : str
+    file : str or None
+    line : int or None
+    doc : dict or None
+    members : list of list
+        Name and value, as text, of each member
+    methods : list of Function
+        Methods and properties documented with it
+    """
+
+    __slots__ = ("name", "file", "line", "doc", "members", "methods")
+    _records = ("methods",)
+
+
+class Module(Record):
+    """
+    A module.
+
+    Attributes
+    ----------
+    name : str
+    documented : bool
+        Whether the module has a docstring. If it hasn't, only its name and
+        members are documented.
+    file : str or None
+    line : int or None
+    doc : dict or None
+    returns : Return or None
+    classes : list of Enum or Class
+        Enums and classes defined in the module
+    functions : list of Function
+        Functions defined in the module
+    """
+
+    __slots__ = (
+        "name",
+        "documented",
+        "file",
+        "line",
+        "doc",
+        "returns",
+        "classes",
+        "functions",
+    )
+    _records = ("returns", "classes", "functions")
+
+
+_KINDS = {
+    cls.__name__: cls for cls in (Parameter, Return, Function, Class, Enum, Module)
+}
+
+
+# Fields which hold the members of a record, left out by `flatten`
+_MEMBERS = ("classes", "functions", "methods")
+
+
+def _flat(record, module_name, parent):
+    data = record.as_dict()
+    for field in _MEMBERS:
+        data.pop(field, None)
+    data.update(module=module_name, parent=parent)
+    return data
+
+
+def flatten(module):
+    """
+    Get a dict for each thing documented in a module, without its members.
+
+    Parameters
+    ----------
+    module : Module
+        Record of the module
+
+    Yields
+    ------
+    dict
+        `Record.as_dict` of the module, then each enum or class followed by
+        its methods, then each function. Each also has the name of the
+        `module` it was documented in, and the name of its `parent` class
+        for methods, or None.
+    """
+    yield _flat(module, module.name, None)
+    for cls in module.classes:
+        yield _flat(cls, module.name, None)
+        for method in cls.methods:
+            yield _flat(method, module.name, cls.name)
+    for function in module.functions:
+        yield _flat(function, module.name, None)
@@ -0,0 +1,103 @@
+"""
+Run the import and documentation of a module in a child process of its own,
+so that a module whose import hangs, uses too much memory or crashes the
+interpreter can't take the whole build with it.
+
+Children are started by a fork server where the platform has one, which
+has mktheapidocs preloaded so each child starts quickly, and are spawned
+afresh otherwise. Either way, a child shares nothing with the process which
+started it other than the arguments it is given.
+"""
+
+import multiprocessing
+import traceback
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, so memory can't be limited
+    resource = None
+
+
+class IsolationError(Exception):
+    """
+    A module couldn't be documented in its child process.
+    """
+
+
+class IsolationTimeout(IsolationError):
+    """
+    A module took too long to document in its child process.
+    """
+
+
+def _context():
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["mktheapidocs.mkapi"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _child(connection, memory_limit, func, args):
+    if memory_limit is not None and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    try:
+        result = func(*args)
+    except BaseException as error:
+        message = "".join(traceback.format_exception_only(type(error), error))
+        connection.send((False, message.strip()))
+    else:
+        connection.send((True, result))
+    finally:
+        connection.close()
+
+
+def run_isolated(func, args=(), timeout=None, memory_limit=None):
+    """
+    Call a function in a child process, and get its result.
+
+    Parameters
+    ----------
+    func : function
+        Function to call, which must be importable by name, as must its
+        arguments and result
+    args : tuple
+        Arguments to call it with
+    timeout : float, optional
+        Seconds to wait for the result before killing the child
+    memory_limit : int, optional
+        Bytes of address space the child may use, where the platform
+        supports limiting it
+
+    Returns
+    -------
+    object
+        Whatever the function returned
+
+    Raises
+    ------
+    IsolationTimeout
+        If the function didn't return within `timeout` seconds
+    IsolationError
+        If the function raised an exception, or the child died
+    """
+    context = _context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(sender, memory_limit, func, args))
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            raise IsolationTimeout(f"timed out after {timeout:g}s")
+        succeeded, result = receiver.recv()
+    except EOFError:
+        process.join()
+        raise IsolationError(f"worker exited with code {process.exitcode}")
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+    if not succeeded:
+        raise IsolationError(result)
+    return result
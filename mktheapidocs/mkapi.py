@@ -1,14 +1,125 @@
+import ast
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
 import inspect
+import itertools
+import json
 import os
 import pathlib
 import importlib
-import black
+import importlib.util
 import re
-import click
+import sys
+import threading
+import weakref
 import enum
-from numpydoc.docscrape import NumpyDocString, FunctionDoc, ClassDoc
 from functools import cmp_to_key
 
+from . import ir, isolate, mock, report, schedule, shard
+from .cache import RenderCache, _write_atomic
+
+_line_indexes = {}
+
+
+class _LineIndexer(ast.NodeVisitor):
+    """
+    Collect the line each class in a file starts on, the same way `inspect`
+    finds them.
+    """
+
+    def __init__(self):
+        self.stack = []
+        self.lines = {}
+
+    def visit_FunctionDef(self, node):
+        self.stack.append(node.name)
+        self.stack.append("<locals>")
+        self.generic_visit(node)
+        self.stack.pop()
+        self.stack.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self.stack.append(node.name)
+        # Classes start at their first decorator, and the first definition wins
+        start = node.decorator_list[0] if node.decorator_list else node
+        self.lines.setdefault(".".join(self.stack), start.lineno)
+        self.generic_visit(node)
+        self.stack.pop()
+
+
+def get_line_index(path):
+    """
+    Get the line numbers of the classes defined in a source file.
+
+    The file is parsed once, and parsed again only if it changes.
+
+    Parameters
+    ----------
+    path : str
+        Source file
+
+    Returns
+    -------
+    dict or None
+        Mapping of qualified class name to line number, or None if the file
+        isn't readable Python source
+    """
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    try:
+        known_stamp, index = _line_indexes[path]
+        if known_stamp == stamp:
+            return index
+    except KeyError:
+        pass
+    try:
+        with open(path, "rb") as source_file:
+            tree = ast.parse(source_file.read(), filename=path)
+        indexer = _LineIndexer()
+        indexer.visit(tree)
+        index = indexer.lines
+    except (SyntaxError, ValueError, OSError):
+        index = None
+    _line_indexes[path] = (stamp, index)
+    return index
+
+
+def _indexed_line(thing):
+    """
+    Look up the line number for something without reading its source,
+    returning None if it can't be found that way.
+    """
+    if inspect.ismodule(thing):
+        if get_line_index(getattr(thing, "__file__", None)) is not None:
+            return 0
+    elif inspect.isclass(thing):
+        module_file = getattr(sys.modules.get(thing.__module__), "__file__", None)
+        index = get_line_index(module_file)
+        if index is not None:
+            return index.get(thing.__qualname__)
+    else:
+        if isinstance(thing, property):
+            thing = thing.fget
+        try:
+            thing = inspect.unwrap(thing)
+        except ValueError:
+            return None
+        if inspect.ismethod(thing):
+            thing = thing.__func__
+        if inspect.isfunction(thing):
+            code = thing.__code__
+            if get_line_index(code.co_filename) is not None:
+                return code.co_firstlineno
+    return None
+
 
 def get_line(thing):
     """
@@ -22,6 +133,9 @@ def get_line(thing):
     int
         Line number in the source file
     """
+    line = _indexed_line(thing)
+    if line is not None:
+        return line
     try:
         return inspect.getsourcelines(thing)[1]
     except TypeError:
@@ -49,120 +163,307 @@ def _sort_modules(mods):
     return sorted(mods, key=cmp_to_key(compare))
 
 
-def get_submodule_files(module, hide=["_version"]):
-    modules = set()
-    module_file = pathlib.Path(module.__file__).parent
-    for root, dirs, files in os.walk(module_file):
-        module_path = pathlib.Path(root).relative_to(module_file.parent)
-        if not module_path.parts[-1].startswith("_"):
-            try:
-                for file in files:
-                    module_name = (
-                        "" if "__init__.py" == file else inspect.getmodulename(file)
-                    )
-                    if module_name is not None and module_name not in hide:
-                        submodule = importlib.import_module(
-                            ".".join((module_path / module_name).parts)
+def get_submodule_files(
+    module, hide=["_version"], import_module=importlib.import_module
+):
+    modules = []
+    for module_name, file in find_submodule_files(
+        module.__name__, pathlib.Path(module.__file__).parent, hide
+    ):
+        try:
+            modules.append((import_module(module_name), file))
+        except ModuleNotFoundError:
+            print(f"Skipping {module_name} - not a module.")
+    return modules
+
+
+def find_module_files(package_name, package_dir, hide=["__init__", "_version"]):
+    """
+    Find the modules to document in a package, without importing any of them.
+
+    Parameters
+    ----------
+    package_name : str
+        Importable name of the package
+    package_dir : str or Path
+        Directory the package lives in
+    hide : list of str
+        Names of modules to skip
+
+    Returns
+    -------
+    list of tuple
+        Sorted tuples of module name, name of the package it belongs to,
+        whether it is a leaf module, and its path
+    """
+    found = []
+    root = pathlib.Path(package_dir).absolute().parent.resolve()
+    to_scan = [(package_name,)]
+    while to_scan:
+        parts = to_scan.pop()
+        directory = root.joinpath(*parts)
+        package = ".".join(parts)
+        documented = not parts[-1].startswith("_") and not package.startswith("_")
+        if documented:
+            found.append((package, package, False, directory))
+        try:
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir():
+                # Private directories are searched too, for public packages
+                # inside them, but symlinked ones aren't followed
+                if not entry.is_symlink():
+                    to_scan.append(parts + (entry.name,))
+            elif documented:
+                module_name = inspect.getmodulename(entry.name)
+                if module_name is not None and module_name not in hide:
+                    found.append(
+                        (
+                            f"{package}.{module_name}",
+                            package,
+                            True,
+                            directory / entry.name,
                         )
-                        modules.add((submodule, module_path / file))
-            except ModuleNotFoundError:
-                print(f"Skipping {'.'.join(module_path.parts)} - not a module.")
-    return _sort_modules(modules)
+                    )
+    return sorted(found)
+
+
+def find_submodule_files(package_name, package_dir, hide=["_version"]):
+    """
+    Find the same modules as `get_submodule_files`, without importing them.
+
+    Parameters
+    ----------
+    package_name : str
+        Importable name of the package
+    package_dir : str or Path
+        Directory the package lives in
+    hide : list of str
+        Names of modules to skip
+
+    Returns
+    -------
+    list of tuple
+        Name of each module, and its path relative to the package's parent
+        directory, with packages first
+    """
+    root = pathlib.Path(package_dir).absolute().parent
+    found = []
+    for module_name, package, leaf, file in find_module_files(
+        package_name, package_dir, ["__init__", *hide]
+    ):
+        if not leaf:
+            file = file / "__init__.py"
+            if not file.is_file():
+                continue
+        found.append((module_name, file.relative_to(root)))
+    return _sort_modules(found)
+
+
+def import_module_file(module_name, package, import_module=importlib.import_module):
+    """
+    Import a module found by `find_module_files`.
+
+    Parameters
+    ----------
+    module_name : str
+        Name of the module
+    package : str
+        Name of the package containing it
+    import_module : function, default importlib.import_module
+        Function to import modules with
+
+    Returns
+    -------
+    module or None
+        The module, or None if it or its package could not be imported
+    """
+    try:
+        with report.phase("import"):
+            import_module(package)
+            return import_module(module_name)
+    except ModuleNotFoundError:
+        print(f"Skipping {module_name} - not a module.")
 
 
 def get_all_modules_from_files(module, hide=["__init__", "_version"]):
     modules = set()
-    module_file = pathlib.Path(module.__file__).parent.parent
-    dir_was = pathlib.Path().absolute()
-    os.chdir(module_file)
-    for root, dirs, files in os.walk(module.__name__):
-        module_path = pathlib.Path(root)
-        if not module_path.parts[-1].startswith("_"):
-            try:
-                module = importlib.import_module(".".join(module_path.parts))
-                if not module.__name__.startswith("_"):
-                    modules.add((module.__name__, module, False, module_path))
-                    for file in files:
-                        module_name = inspect.getmodulename(file)
-                        if module_name is not None and module_name not in hide:
-                            submodule = importlib.import_module(
-                                ".".join(
-                                    (module_path / inspect.getmodulename(file)).parts
-                                )
-                            )
-                            if not module.__name__.startswith(
-                                "_"
-                            ) and not submodule.__name__.startswith("_"):
-                                modules.add(
-                                    (
-                                        submodule.__name__,
-                                        submodule,
-                                        True,
-                                        module_path.absolute() / file,
-                                    )
-                                )
-            except ModuleNotFoundError:
-                print(f"Skipping {'.'.join(module_path.parts)} - not a module.")
-    os.chdir(dir_was)
+    for module_name, package, leaf, file in find_module_files(
+        module.__name__, pathlib.Path(module.__file__).parent, hide
+    ):
+        submodule = import_module_file(module_name, package)
+        if submodule is not None:
+            modules.add((submodule.__name__, submodule, leaf, file))
     return modules
 
 
-def get_classes(module):
-    return set(
-        [
-            x
-            for x in inspect.getmembers(module, inspect.isclass)
-            if (not x[0].startswith("_"))
-            and x[1].__module__ == module.__name__
-            and not type(x[1]) is enum.EnumMeta
-        ]
+class ModuleMembers(
+    collections.namedtuple(
+        "ModuleMembers",
+        ["classes", "enums", "funcs", "available_classes", "available_funcs"],
     )
+):
+    """
+    Public members of a module, sorted into kinds. Each is a set of name,
+    value tuples.
+
+    Attributes
+    ----------
+    classes : set of tuple
+        Classes defined in the module, other than enums
+    enums : set of tuple
+        Enums defined in the module
+    funcs : set of tuple
+        Functions defined in the module
+    available_classes : set of tuple
+        Classes, including enums, defined anywhere in the same package
+    available_funcs : set of tuple
+        Functions defined anywhere in the same package
+    """
+
+    __slots__ = ()
+
+    @property
+    def reexported_classes(self):
+        """Classes from elsewhere in the package which the module re-exports."""
+        return self.available_classes - self.classes - self.enums
+
+    @property
+    def reexported_funcs(self):
+        """Functions from elsewhere in the package which the module re-exports."""
+        return self.available_funcs - self.funcs
+
+
+def get_module_members(module):
+    """
+    Sort the public members of a module into kinds, looking at each of them
+    only once.
+
+    Parameters
+    ----------
+    module : module
+        Module to index
+
+    Returns
+    -------
+    ModuleMembers
+    """
+    shared_root = module.__name__.split(".")[0]
+    members = ModuleMembers(set(), set(), set(), set(), set())
+    for x in inspect.getmembers(module):
+        name, value = x
+        if name.startswith("_"):
+            continue
+        if inspect.isclass(value):
+            deffed, available = members.classes, members.available_classes
+            if type(value) is enum.EnumMeta:
+                deffed = members.enums
+        elif inspect.isfunction(value):
+            deffed, available = members.funcs, members.available_funcs
+        else:
+            continue
+        if value.__module__ == module.__name__:
+            deffed.add(x)
+        if value.__module__.split(".")[0] == shared_root:
+            available.add(x)
+    return members
+
+
+def get_classes(module):
+    return get_module_members(module).classes
 
 
 def get_enums(module):
-    return set(
-        [
-            x
-            for x in inspect.getmembers(module, inspect.isclass)
-            if (not x[0].startswith("_"))
-            and x[1].__module__ == module.__name__
-            and type(x[1]) is enum.EnumMeta
-        ]
-    )
+    return get_module_members(module).enums
 
 
 def get_funcs(module):
-    return set(
-        [
-            x
-            for x in inspect.getmembers(module, inspect.isfunction)
-            if (not x[0].startswith("_")) and x[1].__module__ == module.__name__
-        ]
-    )
+    return get_module_members(module).funcs
 
 
 def get_available_funcs(module):
-    shared_root = module.__name__.split(".")[0]
-    return set(
-        [
-            x
-            for x in inspect.getmembers(module, inspect.isfunction)
-            if (not x[0].startswith("_"))
-            and x[1].__module__.split(".")[0] == shared_root
-        ]
-    )
+    return get_module_members(module).available_funcs
 
 
 def get_available_classes(module):
-    shared_root = module.__name__.split(".")[0]
-    return set(
-        [
-            x
-            for x in inspect.getmembers(module, inspect.isclass)
-            if (not x[0].startswith("_"))
-            and x[1].__module__.split(".")[0] == shared_root
-        ]
-    )
+    return get_module_members(module).available_classes
+
+
+class ClassMembers(collections.namedtuple("ClassMembers", ["methods", "properties"])):
+    """
+    Documented members of a class. Each is a list of name, value tuples.
+
+    Attributes
+    ----------
+    methods : list of tuple
+        Public functions defined in the same file as the class
+    properties : list of tuple
+        Properties, including inherited ones
+    """
+
+    __slots__ = ()
+
+
+_class_members = weakref.WeakKeyDictionary()
+
+
+def get_class_members(cls):
+    """
+    Sort the members of a class into methods and properties, looking at each
+    of them only once.
+
+    The result is remembered for as long as the class exists.
+
+    Parameters
+    ----------
+    cls : class
+        Class to index
+
+    Returns
+    -------
+    ClassMembers
+    """
+    try:
+        return _class_members[cls]
+    except (KeyError, TypeError):
+        pass
+    members = ClassMembers([], [])
+    cls_file = None
+    for x in inspect.getmembers(cls):
+        name, value = x
+        if isinstance(value, property):
+            members.properties.append(x)
+        elif inspect.isfunction(value) and not name.startswith("_"):
+            if cls_file is None:
+                cls_file = inspect.getfile(cls)
+            if inspect.getfile(value) == cls_file:
+                members.methods.append(x)
+    try:
+        _class_members[cls] = members
+    except TypeError:
+        pass
+    return members
+
+
+def get_class_methods(cls):
+    """
+    Get the methods and properties of a class which should be documented.
+
+    Parameters
+    ----------
+    cls : class
+        Class to get methods of
+
+    Returns
+    -------
+    list of tuple
+        Name and method or property
+    """
+    members = get_class_members(cls)
+    return members.methods + members.properties
 
 
 def deffed_here(thing, holder):
@@ -295,6 +596,37 @@ def examples_section(doc, header_level):
     return lines
 
 
+def extract_return(thing):
+    """
+    Get the return annotation of a function, as text.
+
+    Parameters
+    ----------
+    thing : function, property or class
+
+    Returns
+    -------
+    ir.Return or None
+        The annotation, or None if the annotations couldn't be read
+    """
+    return_type = None
+    try:
+        try:
+            return_type = thing.__annotations__["return"]
+        except AttributeError:
+            try:
+                return_type = thing.fget.__annotations__["return"]
+            except:
+                pass
+        except KeyError:
+            pass
+    except Exception:
+        return None
+    if return_type is None:
+        return ir.Return("")
+    return ir.Return(_annotation_text(return_type))
+
+
 def returns_section(thing, doc, header_level):
     """
     Generate markdown for Returns section.
@@ -313,33 +645,16 @@ def returns_section(thing, doc, header_level):
     list of str
         Markdown for examples section
     """
-    lines = []
-    return_type = None
-    # print(thing)
-    # print(doc)
-    try:
-        return_type = thing.__annotations__["return"]
-    except AttributeError:
-        try:
-            return_type = thing.fget.__annotations__["return"]
-        except:
-            pass
-    except KeyError:
-        pass
-    if return_type is None:
-        return_type = ""
-    else:
-        # print(f"{thing} has annotated return type {return_type}")
-        try:
-            return_type = (
-                f"{return_type.__name__}"
-                if return_type.__module__ == "builtins"
-                else f"{return_type.__module__}.{return_type.__name__}"
-            )
-        except AttributeError:
-            return_type = str(return_type)
-        # print(return_type)
+    return _render_returns(extract_return(thing), doc, header_level)
 
+
+def _render_returns(returns, doc, header_level):
+    """
+    Generate markdown for a Returns section from an `ir.Return`, or from the
+    docstring alone if the annotation couldn't be read.
+    """
+    lines = []
+    return_type = "" if returns is None else returns.annotation
     try:
         if "Returns" in doc and len(doc["Returns"]) > 0 or return_type != "":
             # print(doc["Returns"])
@@ -447,6 +762,31 @@ def escape(string):
     return string.replace("_", "\\_")
 
 
+def _source_location(thing):
+    """
+    Find the file, relative to the root of the source repo, and line a
+    module, class or function is defined at, or None and None if they
+    couldn't be found.
+    """
+    try:
+        with report.phase("source_link"):
+            lineno = get_line(thing)
+            try:
+                owner_module = inspect.getmodule(thing)
+                assert owner_module is not None
+            except (TypeError, AssertionError):
+                owner_module = inspect.getmodule(thing.fget)
+
+            thing_file = "/".join(owner_module.__name__.split("."))
+            if owner_module.__file__.endswith("__init__.py"):
+                thing_file += "/__init__.py"
+            else:
+                thing_file += ".py"
+        return thing_file, lineno
+    except Exception as e:
+        return None, None
+
+
 def get_source_link(thing, source_location):
     """
     Get a link to the line number a module/class/function is defined at.
@@ -464,149 +804,404 @@ def get_source_link(thing, source_location):
         String with link to the file & line number, or empty string if it
         couldn't be found
     """
-    try:
-        lineno = get_line(thing)
-        try:
-            owner_module = inspect.getmodule(thing)
-            assert owner_module is not None
-        except (TypeError, AssertionError):
-            owner_module = inspect.getmodule(thing.fget)
-
-        thing_file = "/".join(owner_module.__name__.split("."))
-        if owner_module.__file__.endswith("__init__.py"):
-            thing_file += "/__init__.py"
-        else:
-            thing_file += ".py"
-        return (
-            f"Source: [{escape(thing_file)}]({source_location}/{thing_file}#L{lineno})"
-            + "\n\n"
-        )
-    except Exception as e:
-        # print("Failed to find source file.")
-        # print(e)
-        # print(lineno)
-        # print(thing)
-        # print(owner_module)
-        # print(thing_file)
-        # print(source_location)
-        pass
-    return ""
+    return _render_source_link(*_source_location(thing), source_location)
 
 
-def get_signature(name, thing):
+def _render_source_link(thing_file, lineno, source_location):
+    if thing_file is None:
+        return ""
+    return (
+        f"Source: [{escape(thing_file)}]({source_location}/{thing_file}#L{lineno})"
+        + "\n\n"
+    )
+
+
+class SignatureCache:
     """
-    Get the signature for a function or class, formatted nicely if possible.
+    Bounded least recently used cache of signatures formatted by black,
+    keyed by the signature and line length.
 
     Parameters
     ----------
-    name : str
-        Name of the thing, used as the first part of the signature
-    thing : class or function
-        Thing to get the signature of
+    maxsize : int, default 8192
+        Number of formatted signatures to keep
     """
-    if inspect.ismodule(thing):
-        return ""
-    if isinstance(thing, property):
-        func_sig = name
-    else:
-        try:
-            sig = inspect.signature(thing)
-        except TypeError:
-            sig = inspect.signature(thing.fget)
-        except ValueError:
-            return ""
-        func_sig = f"{name}{sig}"
-        try:
-            mode = black.FileMode(line_length=80)
-            func_sig = black.format_str(func_sig, mode=mode).strip()
-        except (ValueError, TypeError):
-            pass
-    return f"```python\n{func_sig}\n```\n"
 
-
-def _get_names(names, types):
+    def __init__(self, maxsize=8192):
+        self.maxsize = maxsize
+        self._formatted = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._formatted)
+
+    def __contains__(self, key):
+        return key in self._formatted
+
+    def __getitem__(self, key):
+        with self._lock:
+            formatted = self._formatted[key]
+            self._formatted.move_to_end(key)
+        return formatted
+
+    def __setitem__(self, key, formatted):
+        with self._lock:
+            self._formatted[key] = formatted
+            self._formatted.move_to_end(key)
+            while len(self._formatted) > self.maxsize:
+                self._formatted.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._formatted.clear()
+
+    def entries(self):
+        """
+        Get the contents of the cache, least recently used first, in a form
+        which can be serialised to JSON.
+
+        Returns
+        -------
+        list of list
+            Signature, line length and formatted signature for each entry
+        """
+        with self._lock:
+            return [
+                [func_sig, line_length, formatted]
+                for (func_sig, line_length), formatted in self._formatted.items()
+            ]
+
+    def load(self, entries):
+        """
+        Add entries produced by `entries` to the cache. They are treated as
+        older than anything already in the cache, and only fill up any space
+        left in it.
+
+        Parameters
+        ----------
+        entries : list of list
+            Signature, line length and formatted signature for each entry
+        """
+        with self._lock:
+            for func_sig, line_length, formatted in reversed(entries):
+                if len(self._formatted) >= self.maxsize:
+                    break
+                key = (func_sig, line_length)
+                if key in self._formatted:
+                    continue
+                self._formatted[key] = formatted
+                self._formatted.move_to_end(key, last=False)
+
+
+_formatted_signatures = SignatureCache()
+_SIGNATURE_BREAK = "# mktheapidocs: signature break"
+
+
+def _can_format(func_sig):
     """
-    Get names, bearing in mind that there might be no name,
-    no type, and that the `:` separator might be wrongly used.
+    Check whether black can format a signature. Signatures with annotations
+    or bare `*` and `/` separators aren't valid calls, and fail quickly here
+    rather than slowly in black.
     """
-    if types == "":
-        try:
-            names, types = names.split(":")
-        except:
-            pass
-    return names.split(","), types
+    try:
+        ast.parse(func_sig)
+        return True
+    except (SyntaxError, ValueError):
+        return False
 
 
-def string_annotation(typ, default):
+def format_signature(func_sig, line_length=80):
     """
-    Construct a string representation of a type annotation.
+    Format a signature with black, if possible.
+
+    Results are remembered, so each distinct signature is only formatted once.
 
     Parameters
     ----------
-    typ : type
-        Type to turn into a string
-    default : any
-        Default value (if any) of the type
+    func_sig : str
+        Signature to format
+    line_length : int, default 80
+        Maximum line length
 
     Returns
     -------
     str
-        String version of the type annotation
+        The formatted signature, or the original if it couldn't be formatted
     """
     try:
-        type_string = (
-            f"`{typ.__name__}`"
-            if typ.__module__ == "builtins"
-            else f"`{typ.__module__}.{typ.__name__}`"
-        )
-    except AttributeError:
-        type_string = f"`{str(typ)}`"
-    if default is None:
-        type_string = f"{type_string}, default ``None``"
-    elif default == inspect._empty:
+        return _formatted_signatures[(func_sig, line_length)]
+    except KeyError:
         pass
-    else:
-        type_string = f"{type_string}, default ``{default}``"
-    return type_string
+    report.count("signatures_misses")
+    formatted = func_sig
+    if _can_format(func_sig):
+        with report.phase("signature"):
+            import black
+
+            try:
+                mode = black.FileMode(line_length=line_length)
+                formatted = black.format_str(func_sig, mode=mode).strip()
+            except (ValueError, TypeError):
+                pass
+    _formatted_signatures[(func_sig, line_length)] = formatted
+    return formatted
 
 
-def type_list(signature, doc, header):
+def format_signatures(signatures, line_length=80):
     """
-    Construct a list of types, preferring type annotations to
-    docstrings if they are available.
+    Format many signatures with black in a single pass, remembering the
+    results for `format_signature`.
 
     Parameters
     ----------
-    signature : Signature
-        Signature of thing
-    doc : list of tuple
-        Numpydoc's type list section
+    signatures : iterable of str
+        Signatures to format
+    line_length : int, default 80
+        Maximum line length
 
     Returns
     -------
     list of str
-        Markdown formatted type list
+        The formatted signatures
     """
+    signatures = list(signatures)
+    distinct = dict.fromkeys(signatures)
+    pending = [
+        func_sig
+        for func_sig in distinct
+        if (func_sig, line_length) not in _formatted_signatures
+        and _can_format(func_sig)
+    ]
+    report.count(
+        "signatures_hits",
+        sum((func_sig, line_length) in _formatted_signatures for func_sig in distinct),
+    )
+    if len(pending) > 1:
+        batch = "".join(f"{func_sig}\n{_SIGNATURE_BREAK}\n" for func_sig in pending)
+        with report.phase("signature"):
+            import black
 
-    lines = []
-    docced = set()
-    lines.append(header)
-    try:
+            try:
+                mode = black.FileMode(line_length=line_length)
+                formatted = black.format_str(batch, mode=mode)
+                formatted = formatted.split(_SIGNATURE_BREAK)
+                formatted = [func_sig.strip() for func_sig in formatted[:-1]]
+            except (ValueError, TypeError):
+                formatted = []
+        if len(formatted) == len(pending):
+            report.count("signatures_misses", len(pending))
+            for func_sig, formatted_sig in zip(pending, formatted):
+                _formatted_signatures[(func_sig, line_length)] = formatted_sig
+    return [format_signature(func_sig, line_length) for func_sig in signatures]
+
+
+def load_memos(cache):
+    """
+    Load formatted signatures and parsed docstrings saved by `save_memos`.
+
+    Parameters
+    ----------
+    cache : RenderCache
+        Cache to load from
+    """
+    _formatted_signatures.load(cache.load_memo("signatures"))
+    parsed_docstrings.load(cache.load_memo("docstrings"))
+
+
+def save_memos(cache):
+    """
+    Save formatted signatures and parsed docstrings to a cache, so that
+    later builds, and other processes, don't need to redo them.
+
+    Parameters
+    ----------
+    cache : RenderCache
+        Cache to save to
+    """
+    load_memos(cache)
+    cache.save_memo("signatures", _formatted_signatures.entries())
+    cache.save_memo("docstrings", parsed_docstrings.entries())
+
+
+def _signature_text(name, thing):
+    """
+    Get the unformatted signature for a function or class, or None if it
+    doesn't have one.
+    """
+    if inspect.ismodule(thing):
+        return None
+    try:
+        sig = inspect.signature(thing)
+    except TypeError:
+        sig = inspect.signature(thing.fget)
+    except ValueError:
+        return None
+    return f"{name}{sig}"
+
+
+def get_signature(name, thing):
+    """
+    Get the signature for a function or class, formatted nicely if possible.
+
+    Parameters
+    ----------
+    name : str
+        Name of the thing, used as the first part of the signature
+    thing : class or function
+        Thing to get the signature of
+    """
+    if inspect.ismodule(thing):
+        return ""
+    if isinstance(thing, property):
+        func_sig = name
+    else:
+        func_sig = _signature_text(name, thing)
+        if func_sig is None:
+            return ""
+        func_sig = format_signature(func_sig)
+    return f"```python\n{func_sig}\n```\n"
+
+
+def _get_names(names, types):
+    """
+    Get names, bearing in mind that there might be no name,
+    no type, and that the `:` separator might be wrongly used.
+    """
+    if types == "":
+        try:
+            names, types = names.split(":")
+        except:
+            pass
+    return names.split(","), types
+
+
+def _annotation_text(typ):
+    """Text for a type annotation."""
+    try:
+        return (
+            f"{typ.__name__}"
+            if typ.__module__ == "builtins"
+            else f"{typ.__module__}.{typ.__name__}"
+        )
+    except AttributeError:
+        return str(typ)
+
+
+def _default_text(default):
+    """Text for a parameter's default value, or None if it hasn't got one."""
+    if default is None:
+        return "None"
+    try:
+        if default == inspect._empty:
+            return None
+    except Exception:
+        pass
+    return f"{default}"
+
+
+def _type_text(annotation, default):
+    type_string = f"`{annotation}`"
+    if default is not None:
+        type_string = f"{type_string}, default ``{default}``"
+    return type_string
+
+
+def string_annotation(typ, default):
+    """
+    Construct a string representation of a type annotation.
+
+    Parameters
+    ----------
+    typ : type
+        Type to turn into a string
+    default : any
+        Default value (if any) of the type
+
+    Returns
+    -------
+    str
+        String version of the type annotation
+    """
+    return _type_text(_annotation_text(typ), _default_text(default))
+
+
+def extract_parameters(signature):
+    """
+    Get the parameters of a signature, with their annotations and defaults
+    as text.
+
+    Parameters
+    ----------
+    signature : Signature
+        Signature to get the parameters of
+
+    Returns
+    -------
+    list of ir.Parameter
+    """
+    parameters = []
+    for name, parameter in signature.parameters.items():
+        annotation = parameter.annotation
+        parameters.append(
+            ir.Parameter(
+                name,
+                None if annotation == inspect._empty else _annotation_text(annotation),
+                _default_text(parameter.default),
+            )
+        )
+    return parameters
+
+
+def _signature_parameters(thing):
+    """
+    Get the parameters of a function or class, or None if it doesn't have a
+    signature.
+    """
+    try:
+        return extract_parameters(inspect.signature(thing))
+    except Exception:
+        return None
+
+
+def type_list(signature, doc, header):
+    """
+    Construct a list of types, preferring type annotations to
+    docstrings if they are available.
+
+    Parameters
+    ----------
+    signature : Signature
+        Signature of thing
+    doc : list of tuple
+        Numpydoc's type list section
+
+    Returns
+    -------
+    list of str
+        Markdown formatted type list
+    """
+    return _render_type_list(extract_parameters(signature), doc, header)
+
+
+def _render_type_list(parameters, doc, header):
+    """
+    Construct a type list from the `ir.Parameter`s of a signature.
+    """
+    parameters = {parameter.name: parameter for parameter in parameters}
+    lines = []
+    lines.append(header)
+    try:
         for names, types, description in doc:
             names, types = _get_names(names, types)
             unannotated = []
             for name in names:
-                docced.add(name)
-                try:
-                    typ = signature.parameters[name].annotation
-                    if typ == inspect._empty:
-                        raise AttributeError
-                    default = signature.parameters[name].default
-                    type_string = string_annotation(typ, default)
+                parameter = parameters.get(name)
+                if parameter is None or parameter.annotation is None:
+                    unannotated.append(name)  # No annotation
+                else:
+                    type_string = _type_text(parameter.annotation, parameter.default)
                     lines.append(f"- `{name}`: {type_string}")
                     lines.append("\n\n")
-                except (AttributeError, KeyError):
-                    unannotated.append(name)  # No annotation
 
             if len(unannotated) > 0:
                 lines.append("- ")
@@ -615,21 +1210,8 @@ def type_list(signature, doc, header):
                     lines.append(f": {mangle_types(types)}")
             lines.append("\n\n")
             lines.append(f"    {' '.join(description)}\n\n")
-        for names, types, description in doc:
-            names, types = _get_names(names, types)
-            for name in names:
-                if name not in docced:
-                    try:
-                        typ = signature.parameters[name].annotation
-                        default = signature.parameters[name].default
-                        type_string = string_annotation(typ, default)
-                        lines.append(f"- `{name}`: {type_string}")
-                        lines.append("\n\n")
-                    except (AttributeError, KeyError):
-                        lines.append(f"- `{name}`")
-                        lines.append("\n\n")
     except Exception as e:
-        print(f"Couldn't get type list for {signature}: {e}")
+        print(f"Couldn't get type list: {e}")
     return lines if len(lines) > 1 else []
 
 
@@ -637,12 +1219,16 @@ def _split_props(thing, doc):
     """
     Separate properties from other kinds of member.
     """
-    props = inspect.getmembers(thing, lambda o: isinstance(o, property))
+    props = get_class_members(thing).properties
+    return _split_prop_names([prop_name for prop_name, prop in props], doc)
+
+
+def _split_prop_names(props, doc):
     ps = []
     docs = [
         (*_get_names(names, types), names, types, desc) for names, types, desc in doc
     ]
-    for prop_name, prop in props:
+    for prop_name in props:
         in_doc = [d for d in enumerate(docs) if prop_name in d[0]]
         for d in in_doc:
             docs.remove(d)
@@ -678,8 +1264,16 @@ def attributes_section(thing, doc, header_level):
     if not inspect.isclass(thing):
         return []
 
-    props, class_doc = _split_props(thing, doc["Attributes"])
-    tl = type_list(inspect.signature(thing), class_doc, "\n## Attributes\n\n")
+    props = [prop_name for prop_name, prop in get_class_members(thing).properties]
+    props, class_doc = _split_prop_names(props, doc["Attributes"])
+    parameters = extract_parameters(inspect.signature(thing))
+    return _render_attributes(props, class_doc, parameters)
+
+
+def _render_attributes(props, class_doc, parameters):
+    if parameters is None:
+        raise ValueError("Couldn't read the class's signature")
+    tl = _render_type_list(parameters, class_doc, "\n## Attributes\n\n")
     if len(tl) == 0 and len(props) > 0:
         tl.append("\n## Attributes\n\n")
     for prop in props:
@@ -702,62 +1296,181 @@ def enum_doc(name, enum, header_level, source_location):
     source_location : str
         URL of repo containing source code
     """
+    return _render_enum(_extract_enum(name, enum), header_level, source_location)
 
-    lines = [f"{'#'*header_level} Enum **{name}**\n\n"]
-    lines.append(f"```python\n{name}\n```\n")
-    lines.append(get_source_link(enum, source_location))
+
+def _extract_enum(name, enum):
     try:
-        doc = NumpyDocString(inspect.getdoc(enum))._parsed_data
-        lines += summary(doc)
+        doc = _doc_sections(parsed_docstrings.parse(inspect.getdoc(enum)))
     except:
-        pass
+        doc = None
+    return ir.Enum(
+        name,
+        *_source_location(enum),
+        doc,
+        [[str(v).split(".").pop(), f"{v.value}"] for v in enum],
+        [],
+    )
+
+
+def _plain(value):
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+
+def _doc_sections(doc):
+    """
+    Copy numpydoc's sections of a docstring as plain dicts, lists and
+    strings, so they can be stored in a record.
+    """
+    return {section: _plain(doc[section]) for section in doc}
+
+
+def _render_enum(record, header_level, source_location):
+    name = record.name
+    lines = [f"{'#'*header_level} Enum **{name}**\n\n"]
+    lines.append(f"```python\n{name}\n```\n")
+    lines.append(_render_source_link(record.file, record.line, source_location))
+    if record.doc is not None:
+        lines += summary(record.doc)
     lines.append(f"{'#'*(header_level + 1)} Members\n\n")
-    lines += [f"- `{str(v).split('.').pop()}`: `{v.value}` \n\n" for v in enum]
+    lines += [f"- `{member}`: `{value}` \n\n" for member, value in record.members]
     return lines
 
 
-def to_doc(name, thing, header_level, source_location):
+def _object_name(name, thing):
+    """Full name of a documented object, for reporting."""
+    thing = getattr(thing, "fget", thing)
+    module = getattr(thing, "__module__", None)
+    qualname = getattr(thing, "__qualname__", name)
+    if module is None or inspect.ismodule(thing):
+        return getattr(thing, "__name__", name)
+    return f"{module}.{qualname}"
+
+
+def _extract(name, thing):
+    if type(thing) is enum.EnumMeta:
+        return _extract_enum(name, thing)
+    signature = None
+    if not inspect.ismodule(thing) and not isinstance(thing, property):
+        signature = _signature_text(name, thing)
+    thing_file, lineno = _source_location(thing)
+    try:
+        doc = _doc_sections(parsed_docstrings.parse(inspect.getdoc(thing)))
+    except Exception:
+        doc = None
+    parameters, returns = None, None
+    if doc is not None:
+        parameters = _signature_parameters(thing)
+        returns = extract_return(thing)
+    if inspect.ismodule(thing):
+        return ir.Module(name, True, thing_file, lineno, doc, returns, [], [])
+    if inspect.isclass(thing):
+        return ir.Class(
+            name,
+            signature,
+            thing_file,
+            lineno,
+            doc,
+            parameters,
+            returns,
+            [prop_name for prop_name, prop in get_class_members(thing).properties],
+            [],
+        )
+    return ir.Function(
+        name,
+        signature,
+        isinstance(thing, property),
+        thing_file,
+        lineno,
+        doc,
+        parameters,
+        returns,
+    )
+
+
+def extract_object(name, thing):
     """
-    Generate markdown for a class or function
+    Extract what's needed to document a module, class, enum or function.
 
     Parameters
     ----------
     name : str
         Name of the thing being documented
-    thing : class or function
-        Class or function to document
+    thing : module, class, enum or function
+        Thing to document
+
+    Returns
+    -------
+    ir.Module, ir.Class, ir.Enum or ir.Function
+        Record of the thing. Modules are recorded without their members, and
+        classes and enums without their methods.
+    """
+    _record_source(thing)
+    with report.timed("objects", _object_name(name, thing)):
+        return _extract(name, thing)
+
+
+def _render_signature(record):
+    if isinstance(record, ir.Module):
+        return ""
+    if isinstance(record, ir.Function) and record.is_property:
+        return f"```python\n{record.name}\n```\n"
+    if record.signature is None:
+        return ""
+    return f"```python\n{format_signature(record.signature)}\n```\n"
+
+
+def render_object(record, header_level, source_location):
+    """
+    Generate markdown for a module, class, enum or function from its record.
+
+    Parameters
+    ----------
+    record : ir.Module, ir.Class, ir.Enum or ir.Function
+        Record of the thing being documented
     header_level : int
         Heading level
     source_location : str
         URL of repo containing source code
-    """
 
-    if type(thing) is enum.EnumMeta:
-        return enum_doc(name, thing, header_level, source_location)
-    if inspect.isclass(thing):
+    Returns
+    -------
+    list of str
+    """
+    if isinstance(record, ir.Enum):
+        return _render_enum(record, header_level, source_location)
+    name = record.name
+    if isinstance(record, ir.Class):
         header = f"{'#'*header_level} Class **{name}**\n\n"
     else:
         header = f"{'#'*header_level} {name}\n\n"
     lines = [
         header,
-        get_signature(name, thing),
-        get_source_link(thing, source_location),
+        _render_signature(record),
+        _render_source_link(record.file, record.line, source_location),
     ]
-
+    doc = record.doc
+    if doc is None:
+        return lines
     try:
-        # print(f"{name}: {thing}")
-        doc = NumpyDocString(inspect.getdoc(thing))._parsed_data
         lines += summary(doc)
-        # print("Got summary")
-        lines += attributes_section(thing, doc, header_level)
-        # print("Got attribs")
+        if isinstance(record, ir.Class):
+            props, class_doc = _split_prop_names(record.properties, doc["Attributes"])
+            lines += _render_attributes(props, class_doc, record.parameters)
         try:
-            lines += params_section(thing, doc, header_level)
+            if record.parameters is not None:
+                lines += _render_type_list(
+                    record.parameters,
+                    doc["Parameters"],
+                    "#" * (header_level + 1) + " Parameters\n\n",
+                )
         except:
             pass  # No params
-        # print("Got params")
-        lines += returns_section(thing, doc, header_level)
-        # print("Got returns")
+        lines += _render_returns(record.returns, doc, header_level)
         lines += examples_section(doc, header_level)
         lines += notes_section(doc)
         lines += warnings_section(doc)
@@ -768,10 +1481,335 @@ def to_doc(name, thing, header_level, source_location):
     return lines
 
 
-def doc_module(module_name, module, output_dir, source_location, leaf):
+def to_doc(name, thing, header_level, source_location):
+    """
+    Generate markdown for a class or function
+
+    Parameters
+    ----------
+    name : str
+        Name of the thing being documented
+    thing : class or function
+        Class or function to document
+    header_level : int
+        Heading level
+    source_location : str
+        URL of repo containing source code
+    """
+
+    _record_source(thing)
+    with report.timed("objects", _object_name(name, thing)):
+        return render_object(_extract(name, thing), header_level, source_location)
+
+
+class DocstringCache:
+    """
+    Bounded least recently used cache of docstrings parsed by numpydoc,
+    keyed by a hash of the docstring.
+
+    Parameters
+    ----------
+    maxsize : int, default 4096
+        Number of parsed docstrings to keep
+
+    Attributes
+    ----------
+    hits : int
+        Number of docstrings found in the cache
+    misses : int
+        Number of docstrings which had to be parsed
+    """
+
+    # Sections numpydoc parses into lists of Parameter tuples
+    _parameter_sections = {
+        "Parameters",
+        "Returns",
+        "Yields",
+        "Receives",
+        "Raises",
+        "Warns",
+        "Other Parameters",
+        "Attributes",
+        "Methods",
+    }
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._parsed = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._parsed)
+
+    def parse(self, docstring):
+        """
+        Parse a docstring with numpydoc.
+
+        The result is shared with every other caller parsing the same
+        docstring, so must not be modified.
+
+        Parameters
+        ----------
+        docstring : str
+            Cleaned docstring, as returned by `inspect.getdoc`
+
+        Returns
+        -------
+        dict
+            Sections of the docstring
+        """
+        key = hashlib.sha1(docstring.encode()).hexdigest()
+        with self._lock:
+            parsed = self._parsed.get(key)
+            if parsed is None:
+                self.misses += 1
+            else:
+                self._parsed.move_to_end(key)
+                self.hits += 1
+        if parsed is not None:
+            report.count("docstrings_hits")
+            return parsed
+        report.count("docstrings_misses")
+        with report.phase("numpydoc"):
+            from numpydoc.docscrape import NumpyDocString
+
+            parsed = NumpyDocString(docstring)._parsed_data
+        self._store(key, parsed)
+        return parsed
+
+    def _store(self, key, parsed):
+        with self._lock:
+            self._parsed[key] = parsed
+            self._parsed.move_to_end(key)
+            while len(self._parsed) > self.maxsize:
+                self._parsed.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._parsed.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def entries(self):
+        """
+        Get the contents of the cache, least recently used first, in a form
+        which can be serialised to JSON.
+
+        Returns
+        -------
+        list of list
+            Key and parsed sections for each docstring
+        """
+        with self._lock:
+            return [[key, parsed] for key, parsed in self._parsed.items()]
+
+    def load(self, entries):
+        """
+        Add entries produced by `entries` to the cache. They are treated as
+        older than anything already in the cache, and only fill up any space
+        left in it.
+
+        Parameters
+        ----------
+        entries : list of list
+            Key and parsed sections for each docstring
+        """
+        from numpydoc.docscrape import Parameter
+
+        for key, parsed in reversed(entries):
+            if len(self._parsed) >= self.maxsize:
+                break
+            if key in self._parsed:
+                continue
+            for section in self._parameter_sections & parsed.keys():
+                parsed[section] = [Parameter(*param) for param in parsed[section]]
+            self._parsed[key] = parsed
+            self._parsed.move_to_end(key, last=False)
+
+
+parsed_docstrings = DocstringCache()
+
+
+# Source files read while rendering the current page, when one is being
+# rendered, kept per thread so pages can be rendered in several at once
+_reading = threading.local()
+
+page_dependencies = {}
+
+
+def _source_file(thing):
+    module = sys.modules.get(getattr(thing, "__module__", None))
+    return getattr(module, "__file__", None)
+
+
+def _record_source(thing):
+    """
+    Note the source files a documented object is read from. For a class,
+    that includes the files of its base classes, which inherited members
+    and docstrings come from.
+    """
+    read_files = getattr(_reading, "files", None)
+    if read_files is None:
+        return
+    thing = getattr(thing, "fget", thing)
+    if inspect.ismodule(thing):
+        things = []
+        read_files.add(getattr(thing, "__file__", None))
+    elif inspect.isclass(thing):
+        things = inspect.getmro(thing)
+    else:
+        things = [thing]
+    for thing in things:
+        read_files.add(_source_file(thing))
+
+
+@contextlib.contextmanager
+def recording_sources(files):
+    """
+    Add the source files of everything documented in a `with` block to a
+    set.
+
+    Parameters
+    ----------
+    files : set of str
+        Set to add the files to
+    """
+    previous = getattr(_reading, "files", None)
+    _reading.files = files
+    try:
+        yield files
+    finally:
+        _reading.files = previous
+
+
+def _doc_path(output_dir, module_name, leaf):
+    path = pathlib.Path(output_dir).joinpath(*module_name.split("."))
+    if leaf:
+        return path.with_suffix(".md")
+    return path / "index.md"
+
+
+def stub_page(module_name, reason):
+    """
+    Markdown standing in for the documentation of a module which couldn't be
+    documented.
+
+    Parameters
+    ----------
+    module_name : str
+        Full name of the module
+    reason : str
+        Why it couldn't be documented
+
+    Returns
+    -------
+    str
+    """
+    return (
+        f"title: {module_name.split('.')[-1]}\n"
+        f"# {module_name}\n\nThis module could not be documented: {reason}\n"
+    )
+
+
+def extract_module(module_name, module):
+    """
+    Extract what's needed to document a module and its members.
+
+    Parameters
+    ----------
+    module_name : str
+        Name of the module
+    module : module
+        Module to document
+
+    Returns
+    -------
+    ir.Module
+    """
+    members = get_module_members(module)
+    if module.__doc__ is not None:
+        record = extract_object(module.__name__, module)
+    else:
+        record = ir.Module(module.__name__, False, None, None, None, None, [], [])
+    for cls_name, cls in sorted(members.enums) + sorted(members.classes):
+        cls_record = extract_object(cls_name, cls)
+        cls_record.methods = [
+            extract_object(method_name, method)
+            for method_name, method in get_class_methods(cls)
+        ]
+        record.classes.append(cls_record)
+    record.functions = [
+        extract_object(fname, func) for fname, func in sorted(members.funcs)
+    ]
+    return record
+
+
+def render_module(record, source_location):
+    """
+    Render the markdown for a module from its record.
+
+    Parameters
+    ----------
+    record : ir.Module
+        Record of the module
+    source_location : str
+        URL of repo containing source code
+
+    Returns
+    -------
+    str
+    """
+    doc = [f"title: {record.name.split('.')[-1]}" + "\n"]
+
+    # Module overview documentation
+    if record.documented:
+        doc += render_object(record, 1, source_location)
+    else:
+        doc.append(f"# {record.name}\n\n")
+    doc.append("\n\n")
+    # Format all the signatures at once, rather than one by one as they're used
+    format_signatures(
+        func_sig
+        for func_sig in (
+            [cls.signature for cls in record.classes if isinstance(cls, ir.Class)]
+            + [
+                method.signature
+                for cls in record.classes
+                for method in cls.methods
+                if not method.is_property
+            ]
+            + [func.signature for func in record.functions]
+        )
+        if func_sig is not None
+    )
+    for cls in record.classes:
+        doc += render_object(cls, 2, source_location)
+        if len(cls.methods) > 0:
+            doc.append("## Methods \n\n")
+            for method in cls.methods:
+                doc += render_object(method, 4, source_location)
+    for func in record.functions:
+        doc += render_object(func, 2, source_location)
+    doc = "".join(doc)
+    return doc
+
+
+def _render_module(module_name, module, source_location):
+    """
+    Render the markdown for a module.
+    """
+    return render_module(extract_module(module_name, module), source_location)
+
+
+def doc_module(module_name, module, output_dir, source_location, leaf, cache=None):
     """
     Document a module
 
+    The source files the documentation was read from are recorded in
+    `page_dependencies`, under the module's name.
+
     Parameters
     ----------
     module_name : str
@@ -779,73 +1817,803 @@ def doc_module(module_name, module, output_dir, source_location, leaf):
     output_dir : str
     source_location : str
     leaf : bool
+    cache : RenderCache, optional
+        Cache to reuse the documentation from if the module is unchanged
     """
-    path = pathlib.Path(output_dir).joinpath(*module.__name__.split("."))
-    available_classes = get_available_classes(module)
-    deffed_classes = get_classes(module)
-    deffed_funcs = get_funcs(module)
-    deffed_enums = get_enums(module)
-    alias_funcs = available_classes - deffed_classes
-    if leaf:
-        doc_path = path.with_suffix(".md")
-    else:
-        doc_path = path / "index.md"
+    doc_path = _doc_path(output_dir, module.__name__, leaf)
     doc_path.parent.mkdir(parents=True, exist_ok=True)
-    module_path = "/".join(module.__name__.split("."))
-    doc = [f"title: {module_name.split('.')[-1]}" + "\n"]
-    module_doc = module.__doc__
+    with report.timed("modules", module.__name__):
+        cached = None
+        if cache is not None:
+            cached = cache.get(module_name, module, source_location, leaf)
+        if cached is not None:
+            doc, files = cached
+        else:
+            with recording_sources({module.__file__}) as files:
+                doc = _render_module(module_name, module, source_location)
+            files.discard(None)
+            if cache is not None:
+                cache.put(module_name, module, source_location, leaf, doc, files)
+    page_dependencies[module.__name__] = frozenset(files)
+    report.count("modules")
+    report.count("bytes", len(doc.encode()))
+    return doc_path.absolute(), doc
+
+
+def _doc_module_files(
+    module_files,
+    output_dir,
+    source_location,
+    cache_dir,
+    static_package,
+    record=False,
+    trace=False,
+    mock_imports=(),
+    timeout=None,
+    memory_limit=None,
+):
+    """
+    Import and document a share of the modules found by `find_module_files`,
+    with the packages in `mock_imports` mocked. If `timeout` or
+    `memory_limit` is set, each module is imported and documented in a child
+    process of its own, and modules which fail there get a stub page.
 
-    # Module overview documentation
-    if module_doc is not None:
-        doc += to_doc(module.__name__, module, 1, source_location)
-    else:
-        doc.append(f"# {module.__name__}\n\n")
-    doc.append("\n\n")
-    for cls_name, cls in sorted(deffed_enums) + sorted(deffed_classes):
-        doc += to_doc(cls_name, cls, 2, source_location)
+    Returns
+    -------
+    list of tuple, dict or None
+        Source path, documentation path and markdown for each module, and
+        the build report for them if `record` is set, including trace events
+        if `trace` is
+    """
+    build_report = report.BuildReport(trace)
+    if record:
+        build_report.start()
+    cache = (
+        None
+        if cache_dir is None
+        else RenderCache(cache_dir, static_package is not None, mock_imports)
+    )
+    if cache is not None:
+        load_memos(cache)
+    import_module, document = importlib.import_module, doc_module
+    if static_package is not None:
+        from .static import StaticImporter
+
+        importer = StaticImporter(*static_package)
+        import_module, document = importer.import_module, importer.doc_module
+    docs = []
+    try:
+        with mock.mocked(mock_imports):
+            for module_name, package, leaf, file in module_files:
+                if cache is not None:
+                    # Skip importing modules whose documentation, and every
+                    # file it was drawn from, are unchanged
+                    source_file = file if leaf else file / "__init__.py"
+                    cached = cache.lookup(
+                        module_name, module_name, source_file, source_location, leaf
+                    )
+                    if cached is not None:
+                        doc, files = cached
+                        cache.hits += 1
+                        report.count("render_cache_hits")
+                        report.count("modules")
+                        report.count("bytes", len(doc.encode()))
+                        page_dependencies[module_name] = frozenset(files)
+                        doc_path = _doc_path(output_dir, module_name, leaf).absolute()
+                        doc_path.parent.mkdir(parents=True, exist_ok=True)
+                        docs.append((file, doc_path, doc))
+                        continue
+                if timeout is not None or memory_limit is not None:
+                    docs += _isolated_module_doc(
+                        (module_name, package, leaf, file),
+                        output_dir,
+                        source_location,
+                        cache_dir,
+                        static_package,
+                        record,
+                        trace,
+                        mock_imports,
+                        timeout,
+                        memory_limit,
+                        build_report,
+                    )
+                    continue
+                module = import_module_file(module_name, package, import_module)
+                if module is not None:
+                    doc_path, doc = document(
+                        module_name, module, output_dir, source_location, leaf, cache
+                    )
+                    docs.append((file, doc_path, doc))
+        if cache is not None:
+            save_memos(cache)
+    finally:
+        build_report.stop()
+    if not record:
+        return docs, None
+    report_data = build_report.as_dict()
+    if trace:
+        report_data["trace"] = build_report.trace
+    return docs, report_data
+
+
+def _isolated_module_doc(
+    module_file,
+    output_dir,
+    source_location,
+    cache_dir,
+    static_package,
+    record,
+    trace,
+    mock_imports,
+    timeout,
+    memory_limit,
+    build_report,
+):
+    """
+    Import and document a module in a child process, adding the child's
+    build report to `build_report`, and give a stub page if it fails.
+    """
+    module_name, package, leaf, file = module_file
+    try:
+        docs, report_data = isolate.run_isolated(
+            _doc_module_files,
+            (
+                [module_file],
+                output_dir,
+                source_location,
+                cache_dir,
+                static_package,
+                record,
+                trace,
+                mock_imports,
+            ),
+            timeout,
+            memory_limit,
+        )
+    except isolate.IsolationError as error:
+        print(f"Couldn't document {module_name} - {error}")
+        report.fail(module_name, str(error))
+        doc_path = _doc_path(output_dir, module_name, leaf).absolute()
+        doc_path.parent.mkdir(parents=True, exist_ok=True)
+        return [(file, doc_path, stub_page(module_name, str(error)))]
+    if report_data is not None:
+        build_report.merge(report_data)
+    return docs
+
+
+MANIFEST_NAME = ".mktheapidocs-manifest.json"
+
+
+def load_manifest(output_dir):
+    """
+    Load the manifest of documentation files written to a directory.
+
+    Parameters
+    ----------
+    output_dir : str or Path
+        Directory the documentation was written to
+
+    Returns
+    -------
+    dict
+        Mapping of each file's path, relative to `output_dir`, to the sha256
+        hash of its contents
+    """
+    try:
+        with open(pathlib.Path(output_dir) / MANIFEST_NAME) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
 
-        class_methods = [
-            x
-            for x in inspect.getmembers(cls, inspect.isfunction)
-            if (not x[0].startswith("_")) and deffed_here(x[1], cls)
-        ]
-        class_methods += inspect.getmembers(cls, lambda o: isinstance(o, property))
-        if len(class_methods) > 0:
-            doc.append("## Methods \n\n")
-            for method_name, method in class_methods:
-                # print(method_name)
-                doc += to_doc(method_name, method, 4, source_location)
-    for fname, func in sorted(deffed_funcs):
-        doc += to_doc(fname, func, 2, source_location)
-    return doc_path.absolute(), "".join(doc)
 
+def save_manifest(output_dir, manifest):
+    """
+    Save the manifest of documentation files written to a directory.
+
+    Parameters
+    ----------
+    output_dir : str or Path
+        Directory the documentation was written to
+    manifest : dict
+        Mapping of file path to hash, as returned by `load_manifest`
+    """
+    _write_atomic(
+        pathlib.Path(output_dir) / MANIFEST_NAME,
+        json.dumps(manifest, indent=2, sort_keys=True),
+    )
+
+
+def write_if_changed(doc_path, doc, output_dir, manifest):
+    """
+    Write documentation to a file, unless the manifest shows the file already
+    holds it. The file isn't read, so this is as cheap for unchanged files on
+    slow filesystems as on fast ones.
+
+    Parameters
+    ----------
+    doc_path : Path
+        File to write
+    doc : str
+        Documentation to write to it
+    output_dir : Path
+        Directory the manifest's paths are relative to
+    manifest : dict
+        Manifest of the files in `output_dir`, updated with the file's hash
+
+    Returns
+    -------
+    str, bool
+        Path of the file in the manifest, and whether it was written
+    """
+    key = doc_path.relative_to(output_dir).as_posix()
+    digest = hashlib.sha256(doc.encode()).hexdigest()
+    if manifest.get(key) == digest and doc_path.exists():
+        report.count("files_unchanged")
+        return key, False
+    with report.phase("write"):
+        with open(doc_path, "w") as doc_file:
+            doc_file.write(doc)
+    manifest[key] = digest
+    report.count("files_written")
+    return key, True
+
+
+def _write_module_doc(
+    module_file,
+    output_dir,
+    source_location,
+    cache_dir,
+    static_package,
+    mock_imports,
+    timeout,
+    memory_limit,
+):
+    docs, report_data = _doc_module_files(
+        [module_file],
+        output_dir,
+        source_location,
+        cache_dir,
+        static_package,
+        mock_imports=mock_imports,
+        timeout=timeout,
+        memory_limit=memory_limit,
+    )
+    manifest = load_manifest(output_dir)
+    for file, doc_path, doc in docs:
+        write_if_changed(doc_path, doc, output_dir, manifest)
+    save_manifest(output_dir, manifest)
+
+
+def _package_dir(module_name, mock_imports):
+    """
+    Find the directory a package lives in, without importing it.
+    """
+    with mock.mocked(mock_imports):
+        spec = importlib.util.find_spec(module_name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{module_name}'", name=module_name)
+    return pathlib.Path(spec.origin).parent
+
+
+def make_api_doc(
+    module_name,
+    output_dir,
+    source_location,
+    cache_dir=None,
+    static=False,
+    jobs=1,
+    report_path=None,
+    trace_path=None,
+    mock_imports=(),
+    timeout=None,
+    memory_limit=None,
+    shard_of=None,
+    weights=None,
+    stats_path=None,
+):
+    """
+    Write markdown documentation for every module in a package.
+
+    Parameters
+    ----------
+    module_name : str
+        Package to document
+    output_dir : str
+        Directory to write the documentation to
+    source_location : str
+        URL of repo containing source code
+    cache_dir : str, optional
+        Directory to cache documentation for unchanged modules in
+    static : bool, default False
+        Read the package's source with `ast` instead of importing it
+    jobs : int, default 1
+        Number of processes to use. Each process imports and documents its
+        own share of the modules and the parent writes the results. Modules
+        are shared out by how long they are expected to take (see
+        `mktheapidocs.schedule`), and processes which run out of modules
+        take them from the others.
+    report_path : str, optional
+        File to write a JSON report of where the build's time went to
+    trace_path : str, optional
+        File to write a Chrome trace of the build to
+    mock_imports : list of str, optional
+        Packages to replace with stand-ins while importing and documenting,
+        for dependencies which are only needed to run the package
+    timeout : float, optional
+        Seconds to allow for importing and documenting each module
+    memory_limit : int, optional
+        Bytes of memory to allow for importing and documenting each module
+    shard_of : tuple of int, optional
+        Only document one shard of the package's modules, given as the
+        number of the shard, counting from 1, and the number of shards
+    weights : dict, optional
+        Seconds each module took to document in an earlier build, to
+        balance the shards with
+    stats_path : str, optional
+        File to keep the seconds each module takes to document in, which
+        are used to share out the modules of later builds. Defaults to
+        `stats.json` in `cache_dir`, if that's set.
+
+    If `timeout` or `memory_limit` is set, each module is imported and
+    documented in a child process of its own, so a module which hangs,
+    runs out of memory or crashes only costs its own page. Such modules get
+    a stub page, and are listed in the report.
+
+    Only files whose documentation has changed are written. A manifest of
+    the hash of every file's contents is kept in `output_dir`, as
+    `.mktheapidocs-manifest.json`, which can also be used to find the files
+    which need deploying.
+
+    When building a shard, a shard manifest is also written to `output_dir`
+    (see `mktheapidocs.shard`), and the shards are put together with
+    `merge_shards`.
+
+    Returns
+    -------
+    list of tuple
+        Source path of each module, and a function to regenerate its
+        documentation
+    """
+    trace = trace_path is not None
+    build_report = report.BuildReport(trace)
+    with build_report.recording():
+        # Shards keep the time taken by each module, to weight later builds
+        if stats_path is None and cache_dir is not None:
+            stats_path = pathlib.Path(cache_dir) / "stats.json"
+        record = (
+            report_path is not None
+            or trace
+            or shard_of is not None
+            or stats_path is not None
+        )
+        output_dir = pathlib.Path(output_dir).absolute()
+        package_dir = _package_dir(module_name, mock_imports)
+        static_package = (module_name, package_dir) if static else None
+        with report.phase("discover"):
+            module_files = find_module_files(module_name, package_dir)
+        if shard_of is not None:
+            shard_number, shards = shard_of
+            parts = shard.partition(
+                [module_file[0] for module_file in module_files], shards, weights
+            )
+            in_shard = set(parts[shard_number - 1])
+            module_files = [
+                module_file
+                for module_file in module_files
+                if module_file[0] in in_shard
+            ]
+        if jobs > 1:
+            stats = {} if stats_path is None else schedule.load_stats(stats_path)
+            with schedule.SchedulerManager() as manager:
+                scheduler = manager.Scheduler(
+                    module_files, schedule.costs(module_files, stats), jobs
+                )
+                with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+                    docs = executor.map(
+                        _doc_module_files,
+                        [
+                            schedule.Scheduled(scheduler, worker)
+                            for worker in range(jobs)
+                        ],
+                        itertools.repeat(output_dir),
+                        itertools.repeat(source_location),
+                        itertools.repeat(cache_dir),
+                        itertools.repeat(static_package),
+                        itertools.repeat(record),
+                        itertools.repeat(trace),
+                        itertools.repeat(mock_imports),
+                        itertools.repeat(timeout),
+                        itertools.repeat(memory_limit),
+                    )
+                    docs = list(docs)
+                report.count("modules_stolen", scheduler.stolen())
+        else:
+            docs = [
+                _doc_module_files(
+                    module_files,
+                    output_dir,
+                    source_location,
+                    cache_dir,
+                    static_package,
+                    record,
+                    trace,
+                    mock_imports,
+                    timeout,
+                    memory_limit,
+                )
+            ]
+        for share_docs, report_data in docs:
+            if report_data is not None:
+                build_report.merge(report_data)
+        docs = sorted(
+            itertools.chain.from_iterable(share_docs for share_docs, _ in docs)
+        )
+        written = {file for file, doc_path, doc in docs}
+        files = []
+        manifest = load_manifest(output_dir)
+        documented = set()
+        for file, doc_path, doc in docs:
+            key, changed = write_if_changed(doc_path, doc, output_dir, manifest)
+            documented.add(key)
+            if changed:
+                print(f"Built documentation for {file.absolute()}")
+            else:
+                print(f"Documentation unchanged for {file.absolute()}")
+        # Leave out files from earlier builds which weren't produced this time
+        save_manifest(
+            output_dir, {key: manifest[key] for key in manifest if key in documented}
+        )
+        if shard_of is not None:
+            modules = {}
+            for name, package, leaf, file in module_files:
+                key = _doc_path(output_dir, name, leaf).relative_to(output_dir)
+                if key.as_posix() in documented:
+                    modules[name] = dict(
+                        path=key.as_posix(),
+                        sha256=manifest[key.as_posix()],
+                        seconds=build_report.modules.get(name),
+                    )
+        for module_file in module_files:
+            file = module_file[3]
+            if file in written:
+                files.append(
+                    (
+                        file,
+                        functools.partial(
+                            _write_module_doc,
+                            module_file,
+                            output_dir,
+                            source_location,
+                            cache_dir,
+                            static_package,
+                            mock_imports,
+                            timeout,
+                            memory_limit,
+                        ),
+                    )
+                )
+    if stats_path is not None:
+        schedule.save_stats(stats_path, build_report.modules)
+    if shard_of is not None:
+        shard.write_manifest(
+            output_dir,
+            dict(
+                package=module_name,
+                shard=shard_number,
+                shards=shards,
+                partition=shard.fingerprint(parts),
+                modules=modules,
+                report=build_report.as_dict(),
+            ),
+        )
+    if report_path is not None:
+        build_report.write(report_path)
+        print(build_report.summary())
+    if trace:
+        build_report.write_trace(trace_path)
+    return files
 
-@click.command()
-@click.argument("module_name")
-@click.argument("output_dir")
-@click.argument("source-location")
-def cli(module_name, output_dir, source_location):
-    make_api_doc(module_name, output_dir, source_location)
 
+def merge_shards(output_dir, shard_dirs, report_path=None):
+    """
+    Put together the documentation of a package built in shards, as it
+    would have been written by a single build.
 
-def make_api_doc(module_name, output_dir, source_location):
-    module = importlib.import_module(module_name)
+    Parameters
+    ----------
+    output_dir : str
+        Directory to write the documentation to
+    shard_dirs : list of str
+        Directories each shard was built in, one for every shard
+    report_path : str, optional
+        File to write the shards' build reports to, combined. All modules
+        are included, so it can be used to weight the next build's shards.
+
+    Raises
+    ------
+    ValueError
+        If the shards aren't all the shards of the same partition of the
+        same package, or a shard's documentation doesn't match its manifest
+    """
+    manifests = [shard.load_manifest(shard_dir) for shard_dir in shard_dirs]
+    partitions = {
+        (manifest["package"], manifest["shards"], manifest["partition"])
+        for manifest in manifests
+    }
+    if len(partitions) != 1:
+        raise ValueError("Shards are from different packages or partitions.")
+    ((package, shards, _),) = partitions
+    numbers = sorted(manifest["shard"] for manifest in manifests)
+    if numbers != list(range(1, shards + 1)):
+        raise ValueError(f"Expected shards 1 to {shards} of {package}, got {numbers}.")
     output_dir = pathlib.Path(output_dir).absolute()
-    files = []
-    for module_name, module, leaf, file in get_all_modules_from_files(module):
-        # print(module_name)
-        def do_doc():
-            doc_path, doc = doc_module(
-                module_name, module, output_dir, source_location, leaf
+    build_report = report.BuildReport()
+    with build_report.recording():
+        manifest = load_manifest(output_dir)
+        documented = set()
+        for shard_dir, shard_manifest in zip(shard_dirs, manifests):
+            build_report.merge(shard_manifest["report"])
+            for name, module in sorted(shard_manifest["modules"].items()):
+                with open(pathlib.Path(shard_dir) / module["path"]) as doc_file:
+                    doc = doc_file.read()
+                if hashlib.sha256(doc.encode()).hexdigest() != module["sha256"]:
+                    raise ValueError(
+                        f"Documentation of {name} in {shard_dir} has changed "
+                        "since the shard was built."
+                    )
+                doc_path = output_dir / module["path"]
+                doc_path.parent.mkdir(parents=True, exist_ok=True)
+                key, changed = write_if_changed(doc_path, doc, output_dir, manifest)
+                documented.add(key)
+                if changed:
+                    print(f"Merged documentation for {name}")
+                else:
+                    print(f"Documentation unchanged for {name}")
+        save_manifest(
+            output_dir, {key: manifest[key] for key in manifest if key in documented}
+        )
+    if report_path is not None:
+        build_report.write(report_path, top=None)
+        print(build_report.summary())
+
+
+DUMP_FORMATS = ("jsonl", "msgpack")
+
+
+def _module_rows(module_record, source_location):
+    """
+    The records of a module as dicts, each with a link to its `source`.
+    """
+    rows = []
+    for row in ir.flatten(module_record):
+        row["source"] = None
+        if row["file"] is not None:
+            row["source"] = f"{source_location}/{row['file']}#L{row['line']}"
+        rows.append(row)
+    return rows
+
+
+def _iter_module_rows(module_files, source_location, static_package, mock_imports):
+    """
+    Import and extract each of the modules found by `find_module_files` in
+    turn, and yield each one's name and rows.
+    """
+    import_module, importer = importlib.import_module, None
+    if static_package is not None:
+        from .static import StaticImporter
+
+        importer = StaticImporter(*static_package)
+        import_module = importer.import_module
+    with mock.mocked(mock_imports):
+        for module_name, package, leaf, file in module_files:
+            module = import_module_file(module_name, package, import_module)
+            if module is None:
+                continue
+            with report.timed("modules", module_name):
+                with (
+                    contextlib.nullcontext()
+                    if importer is None
+                    else importer.installed()
+                ):
+                    module_record = extract_module(module_name, module)
+            report.count("modules")
+            yield module_name, _module_rows(module_record, source_location)
+
+
+def _dump_module_files(
+    module_files, source_location, static_package, mock_imports, record, trace
+):
+    """
+    Get the rows of a share of the modules, and the build report for them
+    if `record` is set.
+    """
+    build_report = report.BuildReport(trace)
+    if record:
+        build_report.start()
+    try:
+        rows = list(
+            _iter_module_rows(
+                module_files, source_location, static_package, mock_imports
             )
-            with open(doc_path.absolute(), "w") as doc_file:
-                doc_file.write(doc)
+        )
+    finally:
+        build_report.stop()
+    if not record:
+        return rows, None
+    report_data = build_report.as_dict()
+    if trace:
+        report_data["trace"] = build_report.trace
+    return rows, report_data
+
+
+def _dump_module(
+    module_file,
+    source_location,
+    static_package,
+    mock_imports,
+    record,
+    trace,
+    timeout,
+    memory_limit,
+):
+    """
+    Get the rows of one module, in a child process of its own if `timeout`
+    or `memory_limit` is set. A module which fails there gets a single
+    `failure` row.
+    """
+    args = ([module_file], source_location, static_package, mock_imports, record, trace)
+    if timeout is None and memory_limit is None:
+        return _dump_module_files(*args)
+    try:
+        return isolate.run_isolated(_dump_module_files, args, timeout, memory_limit)
+    except isolate.IsolationError as error:
+        module_name = module_file[0]
+        print(f"Couldn't document {module_name} - {error}")
+        report_data = None
+        if record:
+            failed = report.BuildReport()
+            failed.fail(module_name, str(error))
+            report_data = failed.as_dict()
+        failure = dict(kind="failure", module=module_name, reason=str(error))
+        return [(module_name, [failure])], report_data
+
+
+def _merged_rows(dumps, build_report):
+    for rows, report_data in dumps:
+        if report_data is not None:
+            build_report.merge(report_data)
+        yield from rows
+
+
+def _row_encoder(output_format):
+    if output_format == "jsonl":
+        return lambda row: (json.dumps(row, separators=(",", ":")) + "\n").encode()
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError(
+            "Writing msgpack needs the msgpack package, which can be installed "
+            "with `pip install mktheapidocs[msgpack]`"
+        ) from None
+    return msgpack.Packer().pack
+
+
+def dump_api(
+    module_name,
+    output,
+    source_location,
+    output_format="jsonl",
+    static=False,
+    jobs=1,
+    report_path=None,
+    trace_path=None,
+    mock_imports=(),
+    timeout=None,
+    memory_limit=None,
+):
+    """
+    Write a machine readable description of every module in a package, as
+    a stream of records which is written to as each module is documented.
 
-        do_doc()
-        files.append((file, do_doc))
-        print(f"Built documentation for {file.absolute()}")
-    return files
+    There is a record for each module, enum, class, method and function,
+    as given by `ir.flatten`, with a link to its `source`. Each module's
+    record comes first, followed by those of its members. A module which
+    couldn't be documented in a child process of its own has a record of
+    kind `failure`, with the `module` and the `reason`.
+
+    Parameters
+    ----------
+    module_name : str
+        Package to document
+    output : str
+        File to write to, or `-` for standard output
+    source_location : str
+        URL of repo containing source code
+    output_format : {'jsonl', 'msgpack'}, default 'jsonl'
+        Write a line of JSON for each record, or a stream of msgpack maps,
+        which needs the `msgpack` package
+    static : bool, default False
+        Read the package's source with `ast` instead of importing it
+    jobs : int, default 1
+        Number of processes to use
+    report_path : str, optional
+        File to write a JSON report of where the build's time went to
+    trace_path : str, optional
+        File to write a Chrome trace of the build to
+    mock_imports : list of str, optional
+        Packages to replace with stand-ins while importing and documenting
+    timeout : float, optional
+        Seconds to allow for importing and documenting each module
+    memory_limit : int, optional
+        Bytes of memory to allow for importing and documenting each module
+    """
+    encode = _row_encoder(output_format)
+    trace = trace_path is not None
+    build_report = report.BuildReport(trace)
+    with contextlib.ExitStack() as stack:
+        if output == "-":
+            out_file = sys.stdout.buffer
+            # Keep progress messages out of the records
+            stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+        else:
+            pathlib.Path(output).parent.mkdir(parents=True, exist_ok=True)
+            out_file = stack.enter_context(open(output, "wb"))
+        stack.enter_context(build_report.recording())
+        record = report_path is not None or trace
+        package_dir = _package_dir(module_name, mock_imports)
+        static_package = (module_name, package_dir) if static else None
+        with report.phase("discover"):
+            module_files = find_module_files(module_name, package_dir)
+        isolated = timeout is not None or memory_limit is not None
+        if jobs == 1 and not isolated:
+            modules = _iter_module_rows(
+                module_files, source_location, static_package, mock_imports
+            )
+        else:
+            if jobs > 1:
+                executor = stack.enter_context(
+                    concurrent.futures.ProcessPoolExecutor(jobs)
+                )
+                dumps = executor.map
+            else:
+                dumps = map
+            dumps = dumps(
+                _dump_module,
+                module_files,
+                itertools.repeat(source_location),
+                itertools.repeat(static_package),
+                itertools.repeat(mock_imports),
+                itertools.repeat(record),
+                itertools.repeat(trace),
+                itertools.repeat(timeout),
+                itertools.repeat(memory_limit),
+            )
+            modules = _merged_rows(dumps, build_report)
+        for name, rows in modules:
+            with report.phase("write"):
+                for row in rows:
+                    data = encode(row)
+                    out_file.write(data)
+                    report.count("bytes", len(data))
+                out_file.flush()
+            report.count("records", len(rows))
+    if report_path is not None:
+        build_report.write(report_path)
+        print(build_report.summary(), file=sys.stderr if output == "-" else sys.stdout)
+    if trace:
+        build_report.write_trace(trace_path)
+
+
+def __getattr__(name):
+    # The command line interface needs click, so is only imported if it's used
+    if name == "cli":
+        from .cli import cli
+
+        return cli
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
+    from .cli import cli
+
     cli()
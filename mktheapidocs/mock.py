@@ -0,0 +1,174 @@
+"""
+Stand-ins for packages which are too slow or heavy to import just to read
+the docstrings of the code which uses them.
+
+While `mocked` (or `install`) is in effect, importing any of the listed
+packages, or anything inside them, gives a `MockModule` instead. Anything
+taken from a mock module is a `Mock`, which can be called, subscripted,
+used as a decorator (which leaves what it decorates unchanged) or as a base
+class (which gives a placeholder class), so the modules which import them
+can still be imported and documented.
+"""
+
+import contextlib
+import importlib.abc
+import importlib.machinery
+import sys
+import types
+
+
+class Mock:
+    """
+    Stand-in for anything taken from a mocked module.
+
+    Parameters
+    ----------
+    name : str
+        Full dotted name of the thing this stands in for
+    """
+
+    def __init__(self, name):
+        module, _, attr = name.rpartition(".")
+        self.__module__ = module
+        self.__name__ = attr
+        self.__qualname__ = attr
+        self._mock_name = name
+        self._mock_class = None
+
+    def __getattr__(self, name):
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError(name)
+        return Mock(f"{self._mock_name}.{name}")
+
+    def __call__(self, *args, **kwargs):
+        # Used as a bare decorator, so leave the decorated thing alone
+        if len(args) == 1 and not kwargs and callable(args[0]):
+            if not isinstance(args[0], Mock):
+                return args[0]
+        return Mock(f"{self._mock_name}()")
+
+    def __getitem__(self, key):
+        return self
+
+    def __or__(self, other):
+        return self
+
+    __ror__ = __or__
+
+    def __iter__(self):
+        return iter(())
+
+    def __mro_entries__(self, bases):
+        if self._mock_class is None:
+            self._mock_class = type(
+                self.__name__,
+                (),
+                dict(__module__=self.__module__, __qualname__=self.__qualname__),
+            )
+        return (self._mock_class,)
+
+    def __repr__(self):
+        return self._mock_name
+
+
+class MockModule(types.ModuleType):
+    """
+    Stand-in for a mocked module, whose attributes are all `Mock`s.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__path__ = []
+        self.__all__ = []
+
+    def __getattr__(self, name):
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError(name)
+        return Mock(f"{self.__name__}.{name}")
+
+
+class MockFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """
+    Import hook which gives a `MockModule` for the mocked packages and their
+    submodules.
+    """
+
+    def __init__(self):
+        self.names = set()
+
+    def mocks(self, module_name):
+        """Check whether a module is, or is inside, a mocked package."""
+        return any(
+            module_name == name or module_name.startswith(f"{name}.")
+            for name in self.names
+        )
+
+    def find_spec(self, fullname, path=None, target=None):
+        if not self.mocks(fullname):
+            return None
+        return importlib.machinery.ModuleSpec(fullname, self, is_package=True)
+
+    def create_module(self, spec):
+        return MockModule(spec.name)
+
+    def exec_module(self, module):
+        pass
+
+
+_finder = MockFinder()
+
+
+def install(names):
+    """
+    Mock packages from now on. Packages which have already been imported
+    are left as they are.
+
+    Parameters
+    ----------
+    names : iterable of str
+        Names of the packages to mock
+    """
+    _finder.names.update(names)
+    if _finder.names and _finder not in sys.meta_path:
+        sys.meta_path.insert(0, _finder)
+
+
+def uninstall(names=None):
+    """
+    Stop mocking packages, and forget their mock modules.
+
+    Parameters
+    ----------
+    names : iterable of str, optional
+        Names of the packages to stop mocking, all of them by default
+    """
+    if names is None:
+        _finder.names.clear()
+    else:
+        _finder.names.difference_update(names)
+    if not _finder.names and _finder in sys.meta_path:
+        sys.meta_path.remove(_finder)
+    for name, module in list(sys.modules.items()):
+        if isinstance(module, MockModule) and not _finder.mocks(name):
+            del sys.modules[name]
+
+
+@contextlib.contextmanager
+def mocked(names):
+    """
+    Mock packages for the duration of a `with` block.
+
+    Parameters
+    ----------
+    names : iterable of str
+        Names of the packages to mock
+    """
+    names = set(names) - _finder.names
+    if not names:
+        yield
+        return
+    install(names)
+    try:
+        yield
+    finally:
+        uninstall(names)
@@ -1,12 +1,45 @@
+import concurrent.futures
 import functools
 import importlib
+import importlib.util
+import logging
 import mkdocs
+import mkdocs.config.config_options
+import mkdocs.plugins
+import mkdocs.structure.files
 import os
 import pathlib
+import socket
 
 from mkdocs.utils import nest_paths
 
-from .mkapi import get_submodule_files, doc_module
+from . import mock, report
+from .cache import MarkdownStore, RenderCache
+from .daemon import DaemonError, request
+from .isolate import IsolationError, run_isolated
+from .mkapi import (
+    page_dependencies,
+    stub_page,
+    get_submodule_files,
+    find_submodule_files,
+    doc_module,
+    load_memos,
+    save_memos,
+)
+from .reloader import ModuleReloader
+from .static import StaticImporter
+
+# `mkdocs serve` makes a new Plugin for every rebuild, so anything which
+# should survive between rebuilds is kept here.
+_reloaders = {}
+_rendered = {}
+# Source files each rendered page's documentation was drawn from
+_page_files = {}
+# Modification times of the source files of packages which aren't
+# imported here, as they were when they were last built
+_source_mtimes = {}
+
+log = logging.getLogger("mkdocs.plugins.mktheapidocs")
 
 
 class PyDocFile(mkdocs.structure.files.File):
@@ -26,12 +59,15 @@ class PyDocFile(mkdocs.structure.files.File):
 
 
 class Module(mkdocs.config.config_options.OptionallyRequired):
-    """Validate modules specified are installed."""
+    """Validate modules specified are installed, without importing them."""
 
     def run_validation(self, value):
         try:
             for module, details in value.items():
-                importlib.import_module(module)
+                with mock.mocked(details.get("mock_imports", [])):
+                    spec = importlib.util.find_spec(module)
+                if spec is None:
+                    raise ModuleNotFoundError(module)
                 if "section" not in details:
                     raise mkdocs.config.config_options.ValidationError(
                         f"Missing section for {module}"
@@ -51,6 +87,149 @@ class Module(mkdocs.config.config_options.OptionallyRequired):
         return value
 
 
+def _timed_import(import_module, module_name):
+    with report.phase("import"):
+        return import_module(module_name)
+
+
+def _render_page(
+    import_module, document, mock_imports, module_name, source_location, leaf, cache
+):
+    """
+    Document a module, importing it first if it hasn't been already.
+    """
+    with mock.mocked(mock_imports):
+        try:
+            module = import_module(module_name)
+        except ModuleNotFoundError:
+            log.warning(f"Skipping {module_name} - not a module.")
+            return stub_page(module_name, "not a module")
+        return document(module_name, module, "", source_location, leaf, cache)[1]
+
+
+def _document_isolated(module_name, source_location, leaf, cache_dir, mock_imports):
+    """
+    Import and document a module, in a child process started by
+    `_render_isolated_page`.
+    """
+    cache = None if cache_dir is None else RenderCache(cache_dir, False, mock_imports)
+    with mock.mocked(mock_imports):
+        module = importlib.import_module(module_name)
+        markdown = doc_module(module_name, module, "", source_location, leaf, cache)[1]
+    return markdown, page_dependencies[module.__name__]
+
+
+def _render_isolated_page(
+    module_name, source_location, leaf, cache, mock_imports, timeout, memory_limit
+):
+    """
+    Document a module in a child process, so this process never imports it,
+    giving a stub page if that fails or takes too long.
+    """
+    cache_dir = None if cache is None else cache.cache_dir
+    try:
+        with report.timed("modules", module_name):
+            markdown, files = run_isolated(
+                _document_isolated,
+                (module_name, source_location, leaf, cache_dir, mock_imports),
+                timeout,
+                memory_limit,
+            )
+    except IsolationError as error:
+        log.warning(f"Couldn't document {module_name} - {error}")
+        report.fail(module_name, str(error))
+        return stub_page(module_name, str(error))
+    page_dependencies[module_name] = files
+    return markdown
+
+
+def _render_daemon_page(
+    socket_path, timeout, module_name, source_location, render_here
+):
+    """
+    Ask a daemon for a module's page, giving a stub page if the daemon
+    couldn't document it, or rendering it here if the daemon isn't running
+    or doesn't answer in time.
+    """
+    try:
+        with report.timed("modules", module_name):
+            response = request(
+                socket_path,
+                "module",
+                timeout,
+                name=module_name,
+                source_location=source_location,
+            )
+    except socket.timeout:
+        log.warning(
+            f"The daemon on {socket_path} didn't document {module_name} "
+            f"within {timeout} seconds"
+        )
+        return render_here()
+    except OSError as error:
+        log.warning(f"Couldn't reach a daemon on {socket_path} - {error}")
+        return render_here()
+    except DaemonError as error:
+        log.warning(f"Couldn't document {module_name} - {error}")
+        report.fail(module_name, str(error))
+        return stub_page(module_name, str(error))
+    page_dependencies[module_name] = frozenset(response["files"])
+    return response["markdown"]
+
+
+def _keep_page(key, render):
+    """
+    Render a page and keep it with the others, rather than returning it, so
+    pages rendered ahead of being read are held within the memory budget.
+    """
+    _rendered[key] = render()
+    _page_files[key] = page_dependencies.get(key[0])
+
+
+def _discover_package(module_name, hidden, import_module, mock_imports, lazy):
+    """
+    Find the modules of a package, and the directory it lives in. Unless
+    `lazy` is set, the package and its modules are imported to find them.
+    """
+    with mock.mocked(mock_imports):
+        if not lazy:
+            module = import_module(module_name)
+            package_dir = pathlib.Path(module.__file__).parent
+            with report.phase("discover"):
+                submodules = [
+                    (submodule.__name__, file)
+                    for submodule, file in get_submodule_files(
+                        module, hidden, import_module
+                    )
+                ]
+        else:
+            # Find the modules without importing them, and only import
+            # each one when its page is rendered
+            spec = importlib.util.find_spec(module_name)
+            package_dir = pathlib.Path(spec.origin).parent
+            with report.phase("discover"):
+                submodules = find_submodule_files(module_name, package_dir, hidden)
+    return package_dir, submodules
+
+
+def _changed_sources(files):
+    """
+    Source files whose modification time has changed since a build last
+    looked at them. Files which haven't been looked at before count as
+    changed.
+    """
+    changed = set()
+    for file in files:
+        try:
+            mtime = os.stat(file).st_mtime_ns
+        except OSError:
+            mtime = None
+        if file not in _source_mtimes or _source_mtimes[file] != mtime:
+            changed.add(file)
+            _source_mtimes[file] = mtime
+    return changed
+
+
 def find_section_anchor(nav, anchor):
     try:
         in_this_level = nav.index(anchor)
@@ -68,41 +247,196 @@ def find_section_anchor(nav, anchor):
 
 
 class Plugin(mkdocs.plugins.BasePlugin):
-    config_scheme = (("modules", Module(required=True)),)
+    config_scheme = (
+        ("modules", Module(required=True)),
+        ("cache_dir", mkdocs.config.config_options.Type(str, default=None)),
+        ("report_path", mkdocs.config.config_options.Type(str, default=None)),
+        ("report_top", mkdocs.config.config_options.Type(int, default=10)),
+        ("trace_path", mkdocs.config.config_options.Type(str, default=None)),
+        ("memory_budget", mkdocs.config.config_options.Type(int, default=None)),
+        ("threads", mkdocs.config.config_options.Type(int, default=1)),
+        ("daemon_socket", mkdocs.config.config_options.Type(str, default=None)),
+        (
+            "daemon_timeout",
+            mkdocs.config.config_options.Type((int, float), default=60),
+        ),
+    )
 
     def on_config(self, config):
         # print(config)
+        global _rendered
         self.files = {}
         self.module_files = {}
+        self.packages = {}
+        self.reloaders = []
+        self.cache = None
+        self.rendering = {}
+        self.executor = None
+        memory_budget = self.config["memory_budget"]
+        if memory_budget != getattr(_rendered, "budget", None):
+            _rendered = {} if memory_budget is None else MarkdownStore(memory_budget)
+        self.report = report.BuildReport(trace=self.config["trace_path"] is not None)
+        self.report.start()
+        if self.config["cache_dir"] is not None:
+            self.cache = RenderCache(
+                pathlib.Path(config["config_file_path"]).parent
+                / os.path.expandvars(self.config["cache_dir"])
+            )
+            load_memos(self.cache)
+        daemon_socket = self.config["daemon_socket"]
+        if daemon_socket is not None:
+            daemon_socket = pathlib.Path(config["config_file_path"]).parent / (
+                os.path.expandvars(daemon_socket)
+            )
+        setups, discoveries = [], []
         for module_name, details in self.config["modules"].items():
+            static = details.get("static", False)
+            try:
+                reloader, importer = _reloaders[(module_name, static)]
+            except KeyError:
+                reloader, importer = ModuleReloader(module_name), None
+                if static:
+                    spec = importlib.util.find_spec(module_name)
+                    importer = StaticImporter(
+                        module_name, pathlib.Path(spec.origin).parent
+                    )
+                    reloader = ModuleReloader(
+                        module_name, importer.modules, importer.reload
+                    )
+                _reloaders[(module_name, static)] = reloader, importer
+            self.reloaders.append(reloader)
+            import_module, document = importlib.import_module, doc_module
+            if importer is not None:
+                import_module, document = importer.import_module, importer.doc_module
+            import_module = functools.partial(_timed_import, import_module)
+            timeout, memory_limit = details.get("timeout"), details.get("memory_limit")
+            isolated = not static and (timeout is not None or memory_limit is not None)
+            # Modules documented by a daemon, or in child processes, aren't
+            # imported here
+            remote = isolated or (not static and daemon_socket is not None)
+            setups.append(
+                (module_name, details, reloader, import_module, document, remote)
+            )
+            discoveries.append(
+                functools.partial(
+                    _discover_package,
+                    module_name,
+                    details.get("hidden", []),
+                    import_module,
+                    details.get("mock_imports", []),
+                    memory_budget is not None or remote,
+                )
+            )
+        # Discovery is path based, so packages can be found side by side,
+        # apart from those with mocks, which are in effect for every thread
+        threads = self.config["threads"]
+        discovered = [None] * len(discoveries)
+        side_by_side = [
+            ix
+            for ix, (module_name, details, *_) in enumerate(setups)
+            if not details.get("mock_imports")
+        ]
+        if threads > 1 and len(side_by_side) > 1:
+            with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+                futures = {ix: executor.submit(discoveries[ix]) for ix in side_by_side}
+                for ix, future in futures.items():
+                    discovered[ix] = future.result()
+        discovered = [
+            discover() if found is None else found
+            for discover, found in zip(discoveries, discovered)
+        ]
+        for setup, (package_dir, submodules) in zip(setups, discovered):
+            module_name, details, reloader, import_module, document, remote = setup
             target = details["section"]
             self.module_files[target] = []
-            source_location = details["source_repo"]
-            source_location = os.path.expandvars(source_location)
-            module = importlib.import_module(module_name)
-            importlib.reload(module)
-            src_path = pathlib.Path(module.__file__).parent.parent.absolute()
+            source_location = os.path.expandvars(details["source_repo"])
+            static = details.get("static", False)
+            timeout, memory_limit = details.get("timeout"), details.get("memory_limit")
+            isolated = not static and (timeout is not None or memory_limit is not None)
+            self.packages[module_name] = package_dir
+            mock_imports = details.get("mock_imports", [])
+            cache = self.cache
+            if cache is not None and (static or mock_imports):
+                # Reading source, or mocking imports, can document things
+                # differently to importing
+                cache = RenderCache(cache.cache_dir, static, mock_imports)
+            src_path = package_dir.parent.absolute()
             target_path = pathlib.Path(config["site_dir"])
-            for module, file in get_submodule_files(module, details.get("hidden", [])):
-                importlib.reload(module)
-                do_doc = functools.partial(
-                    doc_module,
-                    module.__name__,
-                    module,
-                    "",
-                    source_location,
-                    file.stem != "__init__.py",
-                )
+            with report.phase("reload"), mock.mocked(mock_imports):
+                reloaded = reloader.refresh()
+            changed_files = reloader.changed_files
+            if remote:
+                # Nothing is imported here to be reloaded, so go by the
+                # modules' source files
+                sources = {
+                    os.path.abspath(src_path / file): name for name, file in submodules
+                }
+                changed_files = _changed_sources(sources)
+                reloaded = {sources[file] for file in changed_files}
+            for key in list(_rendered):
+                # Pages are only stale if something they documented came
+                # from a changed file, whichever module it was re-exported by
+                files = _page_files.get(key)
+                if files is None:
+                    stale = key[0] in reloaded
+                else:
+                    stale = not files.isdisjoint(changed_files)
+                if stale:
+                    del _rendered[key]
+                    _page_files.pop(key, None)
+            for submodule_name, file in submodules:
+                # Only the module's name is kept, so reloaded modules are
+                # picked up and nothing here keeps a module alive
+                if isolated:
+                    do_doc = functools.partial(
+                        _render_isolated_page,
+                        submodule_name,
+                        source_location,
+                        file.stem != "__init__.py",
+                        cache,
+                        mock_imports,
+                        timeout,
+                        memory_limit,
+                    )
+                else:
+                    do_doc = functools.partial(
+                        _render_page,
+                        import_module,
+                        document,
+                        mock_imports,
+                        submodule_name,
+                        source_location,
+                        file.stem != "__init__.py",
+                        cache,
+                    )
+                if remote and not isolated:
+                    do_doc = functools.partial(
+                        _render_daemon_page,
+                        daemon_socket,
+                        self.config["daemon_timeout"],
+                        submodule_name,
+                        source_location,
+                        do_doc,
+                    )
                 f = PyDocFile(
                     target / file,
                     src_path,
                     target_path,
                     True,
-                    pathlib.Path(module.__file__).absolute(),
+                    src_path / file,
                 )
                 # print(f.__dict__)
                 # print()
-                self.files[f.url] = (f, do_doc)
+                self.files[f.url] = (
+                    f,
+                    (
+                        submodule_name,
+                        source_location,
+                        static,
+                        tuple(sorted(mock_imports)),
+                    ),
+                    do_doc,
+                )
                 self.module_files[target].append(f)
             if config["nav"]:
                 try:
@@ -114,8 +448,23 @@ class Plugin(mkdocs.plugins.BasePlugin):
                     pass
 
     def on_files(self, files, **kwargs):
-        for f, func in self.files.values():
+        for f, key, func in self.files.values():
             files.append(f)
+        if self.config["threads"] > 1:
+            # Start rendering pages ahead of mkdocs reading them. Pages of
+            # static packages, and of packages with mocks, are left until
+            # they're read, because their stand-in modules are only in
+            # sys.modules while being rendered.
+            # black and numpydoc are imported when they're first needed, so
+            # import them here rather than in several threads at once
+            importlib.import_module("black")
+            importlib.import_module("numpydoc.docscrape")
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                self.config["threads"]
+            )
+            for url, (f, key, func) in self.files.items():
+                if not key[2] and not key[3] and key not in _rendered:
+                    self.rendering[url] = self.executor.submit(_keep_page, key, func)
         return files
 
     def on_nav(self, nav, **kwargs):
@@ -123,12 +472,50 @@ class Plugin(mkdocs.plugins.BasePlugin):
 
     def on_page_read_source(self, page, **kwargs):
         try:
-            f, sf = self.files[page.url]
-            # print(page.__dict__)
-            # print()
-            return sf()[1]
+            f, key, sf = self.files[page.url]
         except KeyError:
             return None
+        # print(page.__dict__)
+        # print()
+        try:
+            return _rendered[key]
+        except KeyError:
+            pass
+        if key[3]:
+            # Mocks would be seen by every thread, so let the pages being
+            # rendered ahead finish first
+            concurrent.futures.wait(list(self.rendering.values()))
+        rendering = self.rendering.pop(page.url, None)
+        if rendering is None:
+            _keep_page(key, sf)
+        else:
+            # Raises anything raised while rendering the page
+            rendering.result()
+        return _rendered[key]
+
+    def on_post_build(self, config, **kwargs):
+        for reloader in self.reloaders:
+            # Modules imported while rendering pages need watching too
+            reloader.track()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+            self.rendering.clear()
+        if self.cache is not None:
+            save_memos(self.cache)
+        self.report.stop()
+        log.info(self.report.summary())
+        if self.config["report_path"] is not None:
+            self.report.write(
+                pathlib.Path(config["config_file_path"]).parent
+                / os.path.expandvars(self.config["report_path"]),
+                self.config["report_top"],
+            )
+        if self.config["trace_path"] is not None:
+            self.report.write_trace(
+                pathlib.Path(config["config_file_path"]).parent
+                / os.path.expandvars(self.config["trace_path"])
+            )
 
     # def on_pre_build(self, config):
     #    root_path = pathlib.Path(config['docs_dir'])
@@ -137,5 +524,7 @@ class Plugin(mkdocs.plugins.BasePlugin):
     def on_serve(self, server, config, builder, **kwargs):
         # print(server.__dict__)
         # print(config)
-        for file, func in self.files.values():
-            server.watch(str(file.abs_src_path), None)
+        # One watch for each package, rather than one for every module. Which
+        # modules changed is worked out by on_config, when it's rebuilding
+        for package_dir in self.packages.values():
+            server.watch(str(package_dir.absolute()), recursive=True)
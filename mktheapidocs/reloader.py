@@ -0,0 +1,170 @@
+"""
+Reload only the modules of a package whose source has changed.
+"""
+
+import importlib
+import inspect
+import os
+import sys
+
+
+class ModuleReloader:
+    """
+    Keep track of the source files of a package's modules, and reload the
+    ones which have changed, along with any module of the package which
+    imports from them.
+
+    Parameters
+    ----------
+    package_name : str
+        Name of the package to track
+    modules : dict, default sys.modules
+        Mapping of module names to the modules to track
+    reload : function, default importlib.reload
+        Function which reloads a module, and returns the new module
+    """
+
+    def __init__(self, package_name, modules=sys.modules, reload=importlib.reload):
+        self.package_name = package_name
+        self.modules = modules
+        self.reload = reload
+        self.mtimes = {}
+        # Source files of the modules which had changed at the last refresh
+        self.changed_files = set()
+
+    def package_modules(self):
+        """
+        Get the modules of the package which have been imported.
+
+        Returns
+        -------
+        dict
+            Mapping of module name to module
+        """
+        prefix = f"{self.package_name}."
+        return {
+            name: module
+            for name, module in list(self.modules.items())
+            if (name == self.package_name or name.startswith(prefix))
+            and getattr(module, "__file__", None) is not None
+        }
+
+    def dependencies(self, module):
+        """
+        Get the modules of the package that a module imports things from.
+
+        Parameters
+        ----------
+        module : module
+            Module to get the dependencies of
+
+        Returns
+        -------
+        set of str
+            Names of the modules
+        """
+        prefix = f"{self.package_name}."
+        names = set()
+        for value in list(vars(module).values()):
+            if inspect.ismodule(value):
+                name = value.__name__
+            elif inspect.isclass(value) or inspect.isfunction(value):
+                name = value.__module__
+            else:
+                continue
+            if isinstance(name, str) and (
+                name == self.package_name or name.startswith(prefix)
+            ):
+                names.add(name)
+        names.discard(module.__name__)
+        return names
+
+    @staticmethod
+    def _mtime(module):
+        try:
+            return os.stat(module.__file__).st_mtime_ns
+        except OSError:
+            return None
+
+    def changed(self, names=None):
+        """
+        Get the modules whose source has changed since they were last seen.
+        Modules which haven't been seen before were imported since then, so
+        are already up to date.
+
+        Parameters
+        ----------
+        names : set of str, optional
+            Only check these modules, such as those a file watcher has seen
+            change, rather than all of them
+
+        Returns
+        -------
+        set of str
+            Names of the changed modules
+        """
+        return {
+            name
+            for name, module in self.package_modules().items()
+            if (names is None or name in names)
+            and name in self.mtimes
+            and self.mtimes[name] != self._mtime(module)
+        }
+
+    def track(self):
+        """
+        Start watching modules of the package imported since the last
+        refresh, as they are now.
+        """
+        for name, module in self.package_modules().items():
+            if name not in self.mtimes:
+                self.mtimes[name] = self._mtime(module)
+
+    def refresh(self, names=None):
+        """
+        Reload the modules which have changed, and those that depend on them,
+        dependencies first. The first refresh only records the modules as
+        they are, so a fresh build imports each module just once.
+
+        Parameters
+        ----------
+        names : set of str, optional
+            Only check these modules for changes, rather than all of them
+
+        Returns
+        -------
+        set of str
+            Names of the modules which were reloaded
+        """
+        modules = self.package_modules()
+        dependencies = {
+            name: self.dependencies(module) for name, module in modules.items()
+        }
+        stale = self.changed(names)
+        self.changed_files = {os.path.abspath(modules[name].__file__) for name in stale}
+        dependents = {}
+        for name, depends_on in dependencies.items():
+            for dependency in depends_on:
+                dependents.setdefault(dependency, set()).add(name)
+        to_check = list(stale)
+        while to_check:
+            for dependent in dependents.get(to_check.pop(), ()):
+                if dependent not in stale:
+                    stale.add(dependent)
+                    to_check.append(dependent)
+        reloaded = set()
+
+        def reload(name):
+            if name in reloaded:
+                return
+            reloaded.add(name)
+            for dependency in sorted(dependencies[name] & stale):
+                reload(dependency)
+            self.reload(modules[name])
+
+        for name in sorted(stale):
+            reload(name)
+        self.mtimes = {
+            name: self._mtime(module) for name, module in self.package_modules().items()
+        }
+        return reloaded
@@ -0,0 +1,373 @@
+"""
+Timings and counters collected while documentation is being built.
+
+A `BuildReport` is made active with `BuildReport.recording`, or `start` and
+`stop` where a build is spread over several calls, as it is in the mkdocs
+plugin. While one is active, the module level `phase`, `timed`, `count` and
+`fail` functions add to it. When none is active they do nothing, so the rest
+of mktheapidocs can call them unconditionally.
+
+A report can also keep every timed span as a Chrome trace event, to be
+loaded into a trace viewer such as Perfetto or `chrome://tracing`.
+"""
+
+import contextlib
+import json
+import os
+import pathlib
+import threading
+import time
+
+_active = None
+
+# Phases timed while building, in the order they are summarised. Phases can
+# be nested (`numpydoc` happens inside `render`) so their times overlap.
+PHASES = (
+    "discover",
+    "import",
+    "reload",
+    "render",
+    "numpydoc",
+    "signature",
+    "source_link",
+    "write",
+)
+
+# Caches whose hits and misses are counted as `<name>_hits` and `<name>_misses`
+CACHES = ("render_cache", "docstrings", "signatures")
+
+
+class BuildReport:
+    """
+    Per-phase, per-module and per-object timings, and counters, for a build.
+
+    Parameters
+    ----------
+    trace : bool, default False
+        Also keep a trace event for every span timed
+    """
+
+    def __init__(self, trace=False):
+        self.phases = {}
+        self.modules = {}
+        self.objects = {}
+        self.counters = {}
+        self.failures = {}
+        self.trace = [] if trace else None
+        self.seconds = 0.0
+        self._started = None
+        self._previous = None
+        # Pages may be rendered in several threads at once
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Make this the active report, and start the build's clock."""
+        global _active
+        self._previous, _active = _active, self
+        self._started = time.perf_counter()
+
+    def stop(self):
+        """Stop the build's clock, and restore the previously active report."""
+        global _active
+        if self._started is not None:
+            self.seconds += time.perf_counter() - self._started
+            self._started = None
+        if _active is self:
+            _active = self._previous
+        self._previous = None
+
+    @contextlib.contextmanager
+    def recording(self):
+        """Make this the active report for the duration of a `with` block."""
+        self.start()
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def add_phase(self, name, seconds, count=1):
+        with self._lock:
+            total = self.phases.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += count
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def fail(self, name, reason):
+        with self._lock:
+            self.failures[name] = reason
+
+    def record(self, kind, name, started, seconds):
+        """
+        Record a timed span.
+
+        Parameters
+        ----------
+        kind : {'phases', 'modules', 'objects'}
+            What was timed. Modules are also timed as the `render` phase.
+        name : str
+            Name of the phase, or full name of the module or object
+        started : float
+            `time.perf_counter` when the span started
+        seconds : float
+            Length of the span
+        """
+        if kind == "phases":
+            self.add_phase(name, seconds)
+        else:
+            with self._lock:
+                timings = getattr(self, kind)
+                timings[name] = timings.get(name, 0.0) + seconds
+            if kind == "modules":
+                self.add_phase("render", seconds)
+        if self.trace is not None:
+            self.trace.append(
+                dict(
+                    name=name,
+                    cat=kind[:-1],
+                    ph="X",
+                    ts=started * 1e6,
+                    dur=seconds * 1e6,
+                    pid=os.getpid(),
+                    tid=threading.get_ident(),
+                )
+            )
+
+    def as_dict(self, top=None):
+        """
+        Get the report as JSON serialisable data.
+
+        Parameters
+        ----------
+        top : int, optional
+            Only include this many of the slowest modules and objects.
+            All are included by default, so that reports from other
+            processes can be merged without losing any.
+
+        Returns
+        -------
+        dict
+        """
+
+        def slowest(timings):
+            ranked = sorted(timings.items(), key=lambda item: (-item[1], item[0]))
+            return [dict(name=name, seconds=seconds) for name, seconds in ranked][:top]
+
+        caches = {}
+        for cache in CACHES:
+            hits = self.counters.get(f"{cache}_hits", 0)
+            misses = self.counters.get(f"{cache}_misses", 0)
+            if hits or misses:
+                caches[cache] = dict(
+                    hits=hits, misses=misses, hit_rate=hits / (hits + misses)
+                )
+        return dict(
+            seconds=self.seconds,
+            phases={
+                name: dict(seconds=seconds, count=count)
+                for name, (seconds, count) in self.phases.items()
+            },
+            counters=dict(sorted(self.counters.items())),
+            caches=caches,
+            slowest_modules=slowest(self.modules),
+            slowest_objects=slowest(self.objects),
+            failed_modules=dict(sorted(self.failures.items())),
+        )
+
+    def merge(self, data):
+        """
+        Add in a report made somewhere else, such as in a worker process.
+
+        Parameters
+        ----------
+        data : dict
+            Report as returned by `as_dict`, with its trace events under
+            `trace` if it has any
+        """
+        if self.trace is not None:
+            self.trace += data.get("trace", [])
+        for name, phase_data in data["phases"].items():
+            self.add_phase(name, phase_data["seconds"], phase_data["count"])
+        for name, n in data["counters"].items():
+            self.count(name, n)
+        self.failures.update(data.get("failed_modules", {}))
+        for timings, slowest in (
+            (self.modules, data["slowest_modules"]),
+            (self.objects, data["slowest_objects"]),
+        ):
+            for entry in slowest:
+                timings[entry["name"]] = (
+                    timings.get(entry["name"], 0.0) + entry["seconds"]
+                )
+
+    def write(self, path, top=10):
+        """
+        Write the report to a JSON file.
+
+        Parameters
+        ----------
+        path : str or Path
+            File to write to
+        top : int, default 10
+            Number of the slowest modules and objects to include
+        """
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as report_file:
+            json.dump(self.as_dict(top), report_file, indent=2)
+
+    def write_trace(self, path):
+        """
+        Write the trace events to a JSON file in Chrome's trace event format.
+
+        Times are taken from `time.perf_counter`, which is shared by every
+        process on the machine, so spans from worker processes line up with
+        those of the process which started them.
+
+        Parameters
+        ----------
+        path : str or Path
+            File to write to
+        """
+        main_pid = os.getpid()
+        names = [
+            dict(
+                name="process_name",
+                ph="M",
+                pid=pid,
+                args=dict(name="mktheapidocs" if pid == main_pid else "worker"),
+            )
+            for pid in sorted({event["pid"] for event in self.trace} | {main_pid})
+        ]
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as trace_file:
+            json.dump(
+                dict(traceEvents=names + self.trace, displayTimeUnit="ms"), trace_file
+            )
+
+    def summary(self):
+        """
+        Summarise the report in a line of text.
+
+        Returns
+        -------
+        str
+        """
+        data = self.as_dict(top=1)
+        parts = [
+            f"documented {self.counters.get('modules', 0)} modules "
+            f"({self.counters.get('bytes', 0)} bytes) in {self.seconds:.2f}s"
+        ]
+        phases = [
+            f"{name} {data['phases'][name]['seconds']:.2f}s"
+            for name in PHASES
+            if name in data["phases"]
+        ]
+        if phases:
+            parts.append(", ".join(phases))
+        caches = [
+            f"{name.replace('_', ' ')} {cache['hit_rate']:.0%} hits"
+            for name, cache in data["caches"].items()
+        ]
+        if caches:
+            parts.append(", ".join(caches))
+        if self.failures:
+            parts.append(f"{len(self.failures)} modules failed")
+        if data["slowest_modules"]:
+            slowest = data["slowest_modules"][0]
+            parts.append(f"slowest module {slowest['name']} {slowest['seconds']:.2f}s")
+        return "; ".join(parts)
+
+
+class _Timer:
+    """Time a `with` block, and record it with a report."""
+
+    __slots__ = ("report", "kind", "name", "started")
+
+    def __init__(self, report, kind, name):
+        self.report = report
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        self.report.record(self.kind, self.name, self.started, seconds)
+
+
+_NOT_RECORDING = contextlib.nullcontext()
+
+
+def phase(name):
+    """
+    Time a phase of the build with the active report, if there is one.
+
+    Parameters
+    ----------
+    name : str
+        Name of the phase, one of `PHASES`
+
+    Returns
+    -------
+    context manager
+    """
+    if _active is None:
+        return _NOT_RECORDING
+    return _Timer(_active, "phases", name)
+
+
+def timed(kind, name):
+    """
+    Time the rendering of a module or object with the active report, if
+    there is one. Modules are also timed as the `render` phase.
+
+    Parameters
+    ----------
+    kind : {'modules', 'objects'}
+        Kind of thing being rendered
+    name : str
+        Full name of the thing being rendered
+
+    Returns
+    -------
+    context manager
+    """
+    if _active is None:
+        return _NOT_RECORDING
+    return _Timer(_active, kind, name)
+
+
+def fail(name, reason):
+    """
+    Note a module which couldn't be documented with the active report, if
+    there is one.
+
+    Parameters
+    ----------
+    name : str
+        Full name of the module
+    reason : str
+        Why it couldn't be documented
+    """
+    if _active is not None:
+        _active.fail(name, reason)
+
+
+def count(name, n=1):
+    """
+    Add to a counter of the active report, if there is one.
+
+    Parameters
+    ----------
+    name : str
+        Name of the counter
+    n : int, default 1
+        Amount to add
+    """
+    if _active is not None:
+        _active.count(name, n)
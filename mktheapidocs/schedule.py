@@ -0,0 +1,236 @@
+"""
+Share modules between worker processes so they all finish at about the
+same time.
+
+A few large modules can take far longer to document than the rest, so
+dealing modules out to workers in turn can leave one worker running long
+after the others have finished. Instead, each module's cost is taken from
+how long it took in earlier builds, kept in a stats file, or estimated from
+the size of its source and how many classes and functions it defines. The
+modules are dealt out most expensive first to whichever worker has the
+least work, into a queue for each worker. A worker takes the most expensive
+module left in its own queue, and when that runs out takes the cheapest
+module from the queue of the worker with the most work left.
+"""
+
+import collections
+import heapq
+import json
+import multiprocessing.managers
+import pathlib
+import re
+import threading
+
+from .cache import _write_atomic
+
+_DEFINITION = re.compile(rb"^[ \t]*(class|def|async def)[ \t]", re.MULTILINE)
+
+
+def load_stats(path):
+    """
+    Read how long each module took to document in earlier builds.
+
+    Parameters
+    ----------
+    path : str or Path
+        Stats file, which needn't exist yet
+
+    Returns
+    -------
+    dict
+        Seconds for each module
+    """
+    try:
+        with open(path) as stats_file:
+            return json.load(stats_file)["modules"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_stats(path, seconds):
+    """
+    Add how long each module took to document to a stats file, replacing
+    any earlier times for the same modules.
+
+    Parameters
+    ----------
+    path : str or Path
+        Stats file
+    seconds : dict
+        Seconds for each module documented
+    """
+    stats = load_stats(path)
+    stats.update(seconds)
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(path, json.dumps(dict(modules=stats), indent=2, sort_keys=True))
+
+
+def estimate(source_file):
+    """
+    Estimate the relative cost of documenting a module from its source.
+
+    Parameters
+    ----------
+    source_file : Path
+        Module's source file
+
+    Returns
+    -------
+    float
+        Cost, in arbitrary units
+    """
+    try:
+        source = pathlib.Path(source_file).read_bytes()
+    except OSError:
+        return 1.0
+    definitions = collections.Counter(
+        match.group(1) for match in _DEFINITION.finditer(source)
+    )
+    return (
+        1.0
+        + len(source) / 1000
+        + 5 * definitions[b"class"]
+        + definitions[b"def"]
+        + definitions[b"async def"]
+    )
+
+
+def costs(module_files, stats):
+    """
+    Expected cost of documenting each module, in seconds where there are
+    stats for enough modules to scale the estimates of the others.
+
+    Parameters
+    ----------
+    module_files : list of tuple
+        Modules, as found by `mkapi.find_module_files`
+    stats : dict
+        Seconds each module took in earlier builds
+
+    Returns
+    -------
+    list of float
+        Cost of each module
+    """
+    estimates = {
+        module_name: estimate(file if leaf else file / "__init__.py")
+        for module_name, package, leaf, file in module_files
+        if module_name not in stats
+    }
+    scale = 1.0
+    if estimates:
+        # Turn the estimates into seconds, by comparing the estimates for
+        # modules which have been timed with how long they took
+        timed = [
+            (stats[module_name], estimate(file if leaf else file / "__init__.py"))
+            for module_name, package, leaf, file in module_files
+            if module_name in stats
+        ]
+        if timed:
+            scale = sum(seconds for seconds, _ in timed) / sum(
+                cost for _, cost in timed
+            )
+    return [
+        stats[module_name] if module_name in stats else estimates[module_name] * scale
+        for module_name, package, leaf, file in module_files
+    ]
+
+
+class Scheduler:
+    """
+    Queues of work for a number of workers, dealt out longest first, from
+    which idle workers steal.
+
+    Parameters
+    ----------
+    items : list
+        Work to do
+    costs : list of float
+        Expected cost of each item
+    workers : int
+        Number of workers
+    """
+
+    def __init__(self, items, costs, workers):
+        self._queues = [collections.deque() for worker in range(workers)]
+        self._remaining = [0.0] * workers
+        self._lock = threading.Lock()
+        self._steals = 0
+        loads = [(0.0, worker) for worker in range(workers)]
+        # Sort on position as well, so equal costs are dealt out in order
+        for cost, ix in sorted(
+            zip(costs, range(len(items))), key=lambda item: (-item[0], item[1])
+        ):
+            load, worker = heapq.heappop(loads)
+            self._queues[worker].append((items[ix], cost))
+            self._remaining[worker] += cost
+            heapq.heappush(loads, (load + cost, worker))
+
+    def next(self, worker):
+        """
+        Get the next item for a worker to do.
+
+        Parameters
+        ----------
+        worker : int
+            Number of the worker
+
+        Returns
+        -------
+        object or None
+            Most expensive item left in the worker's queue, or if that's
+            empty the cheapest item of the worker with most left to do, or
+            None if there's nothing left
+        """
+        with self._lock:
+            if self._queues[worker]:
+                queue, (item, cost) = worker, self._queues[worker].popleft()
+            else:
+                busy = [
+                    queue for queue in range(len(self._queues)) if self._queues[queue]
+                ]
+                if not busy:
+                    return None
+                queue = max(busy, key=self._remaining.__getitem__)
+                item, cost = self._queues[queue].pop()
+                self._steals += 1
+            self._remaining[queue] -= cost
+            return item
+
+    def stolen(self):
+        """Number of items taken from another worker's queue."""
+        return self._steals
+
+
+class SchedulerManager(multiprocessing.managers.BaseManager):
+    """
+    Process which holds a `Scheduler` for workers in other processes.
+    """
+
+
+SchedulerManager.register("Scheduler", Scheduler)
+
+
+class Scheduled:
+    """
+    The items a worker is given by a scheduler, as they are needed.
+
+    Parameters
+    ----------
+    scheduler : Scheduler
+        Scheduler, or proxy for one
+    worker : int
+        Number of the worker
+    """
+
+    def __init__(self, scheduler, worker):
+        self.scheduler = scheduler
+        self.worker = worker
+
+    def __iter__(self):
+        while True:
+            item = self.scheduler.next(self.worker)
+            if item is None:
+                return
+            yield item
@@ -0,0 +1,138 @@
+"""
+Split the documentation of a package across several machines.
+
+Each machine documents one shard of the package's modules, given the same
+package and the same weights, and writes a shard manifest beside its pages.
+`mkapi.merge_shards` then puts the shards' pages back together, exactly as
+a build on a single machine would have written them.
+
+Modules are partitioned greedily, heaviest first, onto the least loaded
+shard, which is deterministic for the same modules and weights. Weights are
+the seconds each module took to document in an earlier build, so the
+shards take about as long as each other. Without weights, or for modules
+which weren't timed, every module counts the same.
+"""
+
+import hashlib
+import heapq
+import json
+import pathlib
+
+from .cache import _write_atomic
+
+SHARD_MANIFEST_NAME = ".mktheapidocs-shard.json"
+
+
+def partition(names, shards, weights=None):
+    """
+    Split module names into shards of about equal weight.
+
+    Parameters
+    ----------
+    names : iterable of str
+        Names of the modules
+    shards : int
+        Number of shards
+    weights : dict, optional
+        Cost of documenting each module. Modules without one cost the mean
+        of those which have one.
+
+    Returns
+    -------
+    list of list of str
+        Names of the modules in each shard
+    """
+    names = sorted(set(names))
+    weights = {name: weights[name] for name in names if name in (weights or {})}
+    default = sum(weights.values()) / len(weights) if weights else 1.0
+    loads = [(0.0, shard) for shard in range(shards)]
+    parts = [[] for shard in range(shards)]
+    for name in sorted(names, key=lambda name: (-weights.get(name, default), name)):
+        load, shard = heapq.heappop(loads)
+        parts[shard].append(name)
+        heapq.heappush(loads, (load + weights.get(name, default), shard))
+    return parts
+
+
+def fingerprint(parts):
+    """
+    Identify a partition, so that shards made with different modules or
+    weights aren't merged.
+
+    Parameters
+    ----------
+    parts : list of list of str
+        Partition from `partition`
+
+    Returns
+    -------
+    str
+    """
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+def load_weights(paths):
+    """
+    Read the seconds each module took to document from earlier builds.
+
+    Parameters
+    ----------
+    paths : iterable of str or Path
+        Shard manifests, or JSON build reports. Reports only include the
+        slowest modules, unless they were written by `merge --report`.
+
+    Returns
+    -------
+    dict
+        Seconds for each module
+    """
+    weights = {}
+    for path in paths:
+        with open(path) as weights_file:
+            data = json.load(weights_file)
+        if "slowest_modules" in data:
+            for entry in data["slowest_modules"]:
+                weights[entry["name"]] = entry["seconds"]
+        else:
+            for name, module in data["modules"].items():
+                if module.get("seconds") is not None:
+                    weights[name] = module["seconds"]
+    return weights
+
+
+def write_manifest(output_dir, manifest):
+    """
+    Write a shard manifest.
+
+    Parameters
+    ----------
+    output_dir : str or Path
+        Directory the shard's documentation was written to
+    manifest : dict
+        The `package`, the `shard` (counting from 1) and number of `shards`,
+        the `partition` fingerprint, the `report` of the shard's build, and
+        the documentation `path`, `sha256` and `seconds` of each of its
+        `modules`
+    """
+    _write_atomic(
+        pathlib.Path(output_dir) / SHARD_MANIFEST_NAME,
+        json.dumps(manifest, indent=2, sort_keys=True),
+    )
+
+
+def load_manifest(shard_dir):
+    """
+    Read the shard manifest written to a directory.
+
+    Parameters
+    ----------
+    shard_dir : str or Path
+        Directory a shard's documentation was written to
+
+    Returns
+    -------
+    dict
+        As given to `write_manifest`
+    """
+    with open(pathlib.Path(shard_dir) / SHARD_MANIFEST_NAME) as manifest_file:
+        return json.load(manifest_file)
@@ -0,0 +1,380 @@
+"""
+Import-free documentation of packages, by parsing their source with `ast`.
+
+`StaticImporter` builds stand-in module objects from source files, populated
+with classes, enums, functions and properties that carry the docstrings,
+signatures and annotations of the originals but none of their behaviour.
+Functions are given code objects pointing at their real file and line, and
+the modules are only visible in `sys.modules` while they are being
+documented, so the usual `mkapi` rendering works on them unchanged without
+any user code being run.
+"""
+
+import ast
+import contextlib
+import enum
+import inspect
+import pathlib
+import sys
+import types
+
+from .mkapi import doc_module
+
+_STUB_CODE = compile("def _(): pass", "<static>", "exec").co_consts[0]
+_ENUM_BASES = {"Enum", "IntEnum", "Flag", "IntFlag", "StrEnum"}
+# Module level functions Python calls itself (PEP 562), which stand-ins
+# taking no arguments and returning None can't be left to answer
+_MODULE_HOOKS = {"__getattr__", "__dir__"}
+
+
+class SourceText(str):
+    """
+    A piece of source code standing in for a value, such as a default or
+    annotation, whose repr is the code as written.
+    """
+
+    def __new__(cls, text, source=None):
+        self = super().__new__(cls, text)
+        self.source = text if source is None else source
+        return self
+
+    def __repr__(self):
+        return self.source
+
+
+def _source_text(node):
+    """
+    Get the source text of an annotation or default, or `inspect._empty`.
+    """
+    if node is None:
+        return inspect._empty
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return SourceText(node.value, ast.unparse(node))
+    return SourceText(ast.unparse(node))
+
+
+def _first_line(node):
+    """Line a definition starts on, counting its decorators."""
+    return min([node.lineno] + [d.lineno for d in node.decorator_list])
+
+
+def _decorator_names(node):
+    names = []
+    for decorator in node.decorator_list:
+        if isinstance(decorator, ast.Call):
+            decorator = decorator.func
+        names.append(ast.unparse(decorator))
+    return names
+
+
+def _signature(args, returns):
+    """
+    Build a signature from an `ast.arguments` node.
+
+    Parameters
+    ----------
+    args : ast.arguments
+        Arguments of the function
+    returns : ast.expr or None
+        Return annotation of the function
+
+    Returns
+    -------
+    inspect.Signature
+    """
+    Parameter = inspect.Parameter
+    params = []
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + args.defaults
+    for ix, (arg, default) in enumerate(zip(positional, defaults)):
+        kind = (
+            Parameter.POSITIONAL_ONLY
+            if ix < len(args.posonlyargs)
+            else Parameter.POSITIONAL_OR_KEYWORD
+        )
+        params.append(
+            Parameter(
+                arg.arg,
+                kind,
+                default=_source_text(default),
+                annotation=_source_text(arg.annotation),
+            )
+        )
+    if args.vararg is not None:
+        params.append(
+            Parameter(
+                args.vararg.arg,
+                Parameter.VAR_POSITIONAL,
+                annotation=_source_text(args.vararg.annotation),
+            )
+        )
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        params.append(
+            Parameter(
+                arg.arg,
+                Parameter.KEYWORD_ONLY,
+                default=_source_text(default),
+                annotation=_source_text(arg.annotation),
+            )
+        )
+    if args.kwarg is not None:
+        params.append(
+            Parameter(
+                args.kwarg.arg,
+                Parameter.VAR_KEYWORD,
+                annotation=_source_text(args.kwarg.annotation),
+            )
+        )
+    return inspect.Signature(params, return_annotation=_source_text(returns))
+
+
+def _definitions(body):
+    """
+    Statements in a block, including those nested in `if` and `try` blocks.
+    """
+    for node in body:
+        if isinstance(node, ast.If):
+            yield from _definitions(node.body)
+            yield from _definitions(node.orelse)
+        elif isinstance(node, ast.Try):
+            yield from _definitions(node.body)
+            for handler in node.handlers:
+                yield from _definitions(handler.body)
+            yield from _definitions(node.orelse)
+            yield from _definitions(node.finalbody)
+        else:
+            yield node
+
+
+class StaticImporter:
+    """
+    Build stand-in modules from the source files of a package.
+
+    Parameters
+    ----------
+    package_name : str
+        Name of the package
+    package_dir : str or Path
+        Directory the package lives in
+    """
+
+    def __init__(self, package_name, package_dir):
+        self.package_name = package_name
+        self.package_dir = pathlib.Path(package_dir).absolute()
+        self.modules = {}
+
+    def _find_source(self, module_name):
+        parts = module_name.split(".")
+        if parts[0] != self.package_name:
+            raise ModuleNotFoundError(
+                f"No module named '{module_name}' in {self.package_name}",
+                name=module_name,
+            )
+        location = self.package_dir.joinpath(*parts[1:])
+        if (location / "__init__.py").is_file():
+            return location / "__init__.py"
+        if location.with_suffix(".py").is_file():
+            return location.with_suffix(".py")
+        raise ModuleNotFoundError(f"No module named '{module_name}'", name=module_name)
+
+    def get_source(self, module_name):
+        """
+        Get the source code of a module, as an import loader would.
+        """
+        return self._find_source(module_name).read_text()
+
+    def import_module(self, module_name):
+        """
+        Build a stand-in for a module from its source.
+
+        Parameters
+        ----------
+        module_name : str
+            Full name of the module
+
+        Returns
+        -------
+        module
+            Module holding the module's documented contents
+        """
+        try:
+            return self.modules[module_name]
+        except KeyError:
+            pass
+        source_file = self._find_source(module_name)
+        tree = ast.parse(source_file.read_bytes(), filename=str(source_file))
+        module = types.ModuleType(module_name, ast.get_docstring(tree))
+        module.__file__ = str(source_file)
+        module.__loader__ = self
+        if source_file.name == "__init__.py":
+            module.__path__ = [str(source_file.parent)]
+            module.__package__ = module_name
+        else:
+            module.__package__ = module_name.rpartition(".")[0]
+        self.modules[module_name] = module
+        for node in _definitions(tree.body):
+            if isinstance(node, ast.ImportFrom):
+                self._import_from(module, node)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if node.name not in _MODULE_HOOKS:
+                    self._add_function(module, vars(module), node, node.name)
+            elif isinstance(node, ast.ClassDef):
+                setattr(module, node.name, self._class(module, node))
+        return module
+
+    def _import_from(self, module, node):
+        """
+        Bring in names imported from other modules this importer can find.
+        """
+        if node.level > 0:
+            package = module.__package__.split(".")
+            package = package[: len(package) - node.level + 1]
+            source = ".".join(package + ([node.module] if node.module else []))
+        else:
+            source = node.module
+        for alias in node.names:
+            if alias.name == "*" or (alias.asname or alias.name) in _MODULE_HOOKS:
+                continue
+            # Anything going wrong only loses the name, rather than the build
+            try:
+                source_module = self.import_module(source)
+                value = getattr(source_module, alias.name)
+            except Exception:
+                try:
+                    value = self.import_module(f"{source}.{alias.name}")
+                except Exception:
+                    continue
+            setattr(module, alias.asname or alias.name, value)
+
+    def _function(self, module, node, qualname):
+        code = _STUB_CODE.replace(
+            co_name=node.name,
+            co_filename=module.__file__,
+            co_firstlineno=_first_line(node),
+        )
+        if sys.version_info >= (3, 11):
+            code = code.replace(co_qualname=qualname)
+        function = types.FunctionType(code, vars(module), node.name)
+        function.__qualname__ = qualname
+        function.__doc__ = ast.get_docstring(node)
+        function.__signature__ = _signature(node.args, node.returns)
+        if node.returns is not None:
+            function.__annotations__ = {"return": _source_text(node.returns)}
+        return function
+
+    def _add_function(self, module, namespace, node, qualname):
+        decorators = _decorator_names(node)
+        if any(name.endswith((".setter", ".deleter")) for name in decorators):
+            return
+        function = self._function(module, node, qualname)
+        if "property" in decorators:
+            function = property(function, doc=function.__doc__)
+        elif "staticmethod" in decorators:
+            function = staticmethod(function)
+        elif "classmethod" in decorators:
+            function = classmethod(function)
+        namespace[node.name] = function
+
+    def _resolve(self, module, node):
+        """Find the stand-in for a name used in a module, if there is one."""
+        if isinstance(node, ast.Name):
+            return getattr(module, node.id, None)
+        if isinstance(node, ast.Attribute):
+            owner = self._resolve(module, node.value)
+            return getattr(owner, node.attr, None)
+        return None
+
+    def _class(self, module, node, qualname=None):
+        qualname = qualname or node.name
+        bases = []
+        is_enum = False
+        for base_node in node.bases:
+            base = self._resolve(module, base_node)
+            if isinstance(base, enum.EnumMeta) or (
+                base is None and ast.unparse(base_node).split(".")[-1] in _ENUM_BASES
+            ):
+                is_enum = True
+            elif inspect.isclass(base):
+                bases.append(base)
+        namespace = {}
+        members = []
+        for child in _definitions(node.body):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self._add_function(module, namespace, child, f"{qualname}.{child.name}")
+            elif is_enum and isinstance(child, (ast.Assign, ast.AnnAssign)):
+                targets = (
+                    child.targets if isinstance(child, ast.Assign) else [child.target]
+                )
+                if child.value is not None:
+                    for target in targets:
+                        if isinstance(target, ast.Name):
+                            if not target.id.startswith("_"):
+                                members.append(
+                                    (target.id, self._enum_value(child.value))
+                                )
+        if is_enum:
+            cls = enum.Enum(
+                node.name, members, module=module.__name__, qualname=qualname
+            )
+            for name, value in namespace.items():
+                setattr(cls, name, value)
+        else:
+            namespace.update(__module__=module.__name__, __qualname__=qualname)
+            try:
+                cls = type(node.name, tuple(bases), namespace)
+            except TypeError:
+                cls = type(node.name, (), namespace)
+        cls.__doc__ = ast.get_docstring(node)
+        return cls
+
+    @staticmethod
+    def _enum_value(node):
+        if isinstance(node, ast.Call) and ast.unparse(node.func).split(".")[-1] == (
+            "auto"
+        ):
+            return enum.auto()
+        try:
+            return ast.literal_eval(node)
+        except ValueError:
+            return SourceText(ast.unparse(node))
+
+    @contextlib.contextmanager
+    def installed(self):
+        """
+        Make the stand-in modules visible in `sys.modules`, where `inspect`
+        looks for them, without replacing any modules already imported.
+        """
+        added = [name for name in self.modules if name not in sys.modules]
+        for name in added:
+            sys.modules[name] = self.modules[name]
+        try:
+            yield self
+        finally:
+            for name in added:
+                if sys.modules.get(name) is self.modules[name]:
+                    del sys.modules[name]
+
+    def doc_module(self, *args, **kwargs):
+        """
+        Document a stand-in module, taking the same arguments as
+        `mkapi.doc_module`.
+        """
+        with self.installed():
+            return doc_module(*args, **kwargs)
+
+    def reload(self, module):
+        """
+        Rebuild a stand-in module from its source.
+
+        Parameters
+        ----------
+        module : module
+            Stand-in module to rebuild
+
+        Returns
+        -------
+        module
+            The new stand-in
+        """
+        del self.modules[module.__name__]
+        return self.import_module(module.__name__)
@@ -47,7 +47,7 @@ setup(
     version=versioneer.get_version(),
     cmdclass=versioneer.get_cmdclass(),
     entry_points={
-        "console_scripts": ["mktheapidocs = mktheapidocs.mkapi:cli"],
+        "console_scripts": ["mktheapidocs = mktheapidocs.cli:cli"],
         "mkdocs.plugins": ["mktheapidocs = mktheapidocs.plugin:Plugin"],
     },
     description="Generate markdown API documentation from Numpydoc docstrings.",
@@ -59,7 +59,7 @@ setup(
     packages=["mktheapidocs"],
     include_package_data=True,
     install_requires=["numpydoc", "black", "click"],
-    extras_require={"plugin": ["mkdocs >= 1.2"]},
+    extras_require={"plugin": ["mkdocs >= 1.2"], "msgpack": ["msgpack"]},
     platforms=["MacOS X", "Linux"],
     classifiers=[
         "Development Status :: 3 - Alpha",
@@ -0,0 +1,86 @@
+import contextlib
+import io
+import textwrap
+import types
+
+from mktheapidocs import mkapi
+from mktheapidocs.cache import RenderCache
+
+SOURCE = '''
+"""
+A module.
+"""
+
+import typing
+
+
+def f(x: typing.List[int]) -> int:
+    """
+    Add up some numbers.
+
+    Parameters
+    ----------
+    x : list of int
+        Numbers to add up
+
+    Returns
+    -------
+    int
+    """
+    return sum(x)
+'''
+
+
+def _build(output_dir, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        mkapi.make_api_doc(
+            "cachedpkg", output_dir, "https://github.com/example/cachedpkg", **kwargs
+        )
+    mkapi.parsed_docstrings.clear()
+    mkapi._formatted_signatures.clear()
+    return {
+        str(path.relative_to(output_dir)): path.read_text()
+        for path in output_dir.rglob("*.md")
+    }
+
+
+def test_static_and_imported_builds_share_a_cache_dir(tmp_path, monkeypatch):
+    package_dir = tmp_path / "src" / "cachedpkg"
+    package_dir.mkdir(parents=True)
+    (package_dir / "__init__.py").write_text('"""A package."""\n')
+    (package_dir / "core.py").write_text(textwrap.dedent(SOURCE))
+    monkeypatch.syspath_prepend(str(tmp_path / "src"))
+    cache_dir = tmp_path / "cache"
+
+    static = _build(tmp_path / "static", static=True)
+    imported = _build(tmp_path / "imported")
+    # Reading the source keeps the annotation's arguments, importing doesn't
+    assert static != imported
+
+    assert _build(tmp_path / "static_cached", static=True, cache_dir=cache_dir) == (
+        static
+    )
+    assert _build(tmp_path / "imported_cached", cache_dir=cache_dir) == imported
+    assert _build(tmp_path / "static_again", static=True, cache_dir=cache_dir) == (
+        static
+    )
+
+
+def test_entries_are_kept_apart_by_mock_imports(tmp_path):
+    source_file = tmp_path / "core.py"
+    source_file.write_text(textwrap.dedent(SOURCE))
+    mocked = RenderCache(tmp_path / "cache", mock_imports=["numpy", "pandas"])
+    mocked_too = RenderCache(tmp_path / "cache", mock_imports=["pandas", "numpy"])
+    unmocked = RenderCache(tmp_path / "cache")
+    args = ("core", "core", source_file, "https://src", True)
+    mocked.put(
+        "core",
+        types.SimpleNamespace(__name__="core", __file__=str(source_file)),
+        "https://src",
+        True,
+        "# core\n",
+        [source_file],
+    )
+
+    assert mocked_too.lookup(*args) == ("# core\n", {str(source_file)})
+    assert unmocked.lookup(*args) is None
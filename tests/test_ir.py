@@ -0,0 +1,144 @@
+import json
+import pickle
+import sys
+
+import pytest
+
+from mktheapidocs import ir, mkapi
+
+SOURCE = '''
+"""
+A module with a bit of everything.
+"""
+
+import enum
+import typing
+
+
+class Colour(enum.Enum):
+    """
+    Some colours.
+    """
+
+    RED = 1
+    GREEN = 2
+
+
+class Thing:
+    """
+    A thing.
+
+    Parameters
+    ----------
+    size : int
+        How big it is
+
+    Attributes
+    ----------
+    size : int
+        How big it is
+    """
+
+    def __init__(self, size: int = 3):
+        self.size = size
+
+    @property
+    def doubled(self) -> int:
+        """
+        Twice the size.
+        """
+        return self.size * 2
+
+    def grow(self, by: typing.Optional[int] = None) -> "Thing":
+        """
+        Make a bigger thing.
+
+        Parameters
+        ----------
+        by : int, optional
+            How much bigger
+
+        Returns
+        -------
+        Thing
+            The bigger thing
+
+        Raises
+        ------
+        ValueError
+            If `by` is negative
+        """
+        return Thing(self.size + (by or 1))
+
+
+def make(colour: Colour, *things: Thing, **options) -> typing.List[Thing]:
+    """
+    Make some things.
+
+    Parameters
+    ----------
+    colour : Colour
+        Colour to make them
+    things : Thing
+        Things to start from
+    options : dict
+        Anything else
+
+    Returns
+    -------
+    list of Thing
+
+    Examples
+    --------
+    >>> make(Colour.RED)
+    []
+    """
+    return list(things)
+'''
+
+
+@pytest.fixture
+def record(tmp_path, monkeypatch):
+    (tmp_path / "irmodule.py").write_text(SOURCE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import irmodule
+
+    yield mkapi.extract_module("irmodule", irmodule)
+    del sys.modules["irmodule"]
+    mkapi.parsed_docstrings.clear()
+    mkapi._formatted_signatures.clear()
+
+
+@pytest.mark.parametrize(
+    "roundtrip",
+    [
+        lambda data: data,
+        lambda data: json.loads(json.dumps(data)),
+        lambda data: pickle.loads(pickle.dumps(data)),
+    ],
+)
+def test_dumped_records_load_the_same(record, roundtrip):
+    loaded = ir.load(roundtrip(record.dump()))
+
+    assert loaded == record
+    assert mkapi.render_module(loaded, "https://src") == mkapi.render_module(
+        record, "https://src"
+    )
+
+
+def test_records_pickle(record):
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_flattened_records(record):
+    rows = list(ir.flatten(record))
+
+    assert [(row["kind"], row["name"]) for row in rows] == [
+        ("module", "irmodule"),
+        ("enum", "Colour"),
+        ("class", "Thing"),
+        ("function", "grow"),
+        ("function", "doubled"),
+        ("function", "make"),
+    ]
+    assert json.loads(json.dumps(rows)) == rows
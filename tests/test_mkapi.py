@@ -0,0 +1,46 @@
+import pytest
+
+from mktheapidocs import mkapi
+
+
+def test_missing_package(tmp_path):
+    with pytest.raises(ModuleNotFoundError, match="nosuchpackage"):
+        mkapi.make_api_doc("nosuchpackage", tmp_path, "https://src")
+
+
+def documented(x):
+    """
+    Do something.
+
+    Parameters
+    ----------
+    x : int
+        A number
+
+    Returns
+    -------
+    int
+        Another number
+
+    Examples
+    --------
+    >>> documented(1)
+    2
+    """
+    return x + 1
+
+
+def test_unreadable_return_annotation(monkeypatch):
+    monkeypatch.setattr(mkapi, "extract_return", lambda thing: None)
+
+    markdown = "".join(mkapi.to_doc("documented", documented, 2, "https://src"))
+
+    assert "### Returns" in markdown
+    assert "Another number" in markdown
+    assert "### Examples" in markdown
+
+
+def test_stub_page_has_a_title():
+    assert mkapi.stub_page("package.module", "timed out").startswith(
+        "title: module\n# package.module\n"
+    )
@@ -0,0 +1,152 @@
+import os
+import sys
+import types
+
+import pytest
+
+from mktheapidocs import mkapi, plugin
+
+MODULE = '''
+import fakeheavy
+
+
+def f(x=fakeheavy.DEFAULT):
+    """
+    Do something.
+    """
+'''
+
+
+@pytest.fixture
+def packages(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    for name, source in [
+        ("fakeheavy", "DEFAULT = 42\n"),
+        ("mocker", MODULE),
+        ("usesreal", MODULE),
+    ]:
+        (src / name).mkdir(parents=True)
+        (src / name / "__init__.py").write_text(source)
+    monkeypatch.syspath_prepend(str(src))
+    yield tmp_path
+    for name in list(sys.modules):
+        if name.split(".")[0] in ("fakeheavy", "mocker", "usesreal"):
+            del sys.modules[name]
+
+
+def _build(tmp_path, **options):
+    plugin._reloaders.clear()
+    plugin._rendered.clear()
+    plugin._page_files.clear()
+    mkapi.parsed_docstrings.clear()
+    mkapi._formatted_signatures.clear()
+    docs_plugin = plugin.Plugin()
+    errors, warnings = docs_plugin.load_config(
+        dict(
+            modules={
+                "mocker": dict(
+                    section="mocker",
+                    source_repo="https://src",
+                    mock_imports=["fakeheavy"],
+                ),
+                "usesreal": dict(section="usesreal", source_repo="https://src"),
+            },
+            **options,
+        )
+    )
+    assert not errors
+    config = dict(
+        site_dir=str(tmp_path / "site"),
+        nav=None,
+        config_file_path=str(tmp_path / "mkdocs.yml"),
+    )
+    docs_plugin.on_config(config)
+    pages = {
+        f.url: docs_plugin.on_page_read_source(types.SimpleNamespace(url=f.url))
+        for f in docs_plugin.on_files([])
+    }
+    docs_plugin.on_post_build(config)
+    return pages
+
+
+@pytest.mark.parametrize("options", [{}, dict(threads=4), dict(cache_dir="cache")])
+def test_mocks_are_only_seen_by_their_own_module(packages, options):
+    for build in range(2):
+        pages = _build(packages, **options)
+        assert "f(x=fakeheavy.DEFAULT)" in pages["mocker/mocker/__init__/"]
+        assert "f(x=42)" in pages["usesreal/usesreal/__init__/"]
+        assert "fakeheavy" not in sys.modules or (
+            sys.modules["fakeheavy"].DEFAULT == 42
+        )
+
+
+@pytest.fixture
+def watched(tmp_path, monkeypatch):
+    package_dir = tmp_path / "src" / "watched"
+    package_dir.mkdir(parents=True)
+    (package_dir / "__init__.py").write_text('"""A package."""\n')
+    (package_dir / "core.py").write_text(
+        'class Base:\n    """A base class."""\n\n'
+        '    def f(self):\n        """Version one."""\n'
+    )
+    (package_dir / "uses.py").write_text(
+        'from .core import Base\n\n\nclass Child(Base):\n    """A child class."""\n'
+    )
+    (package_dir / "other.py").write_text('def h():\n    """Unrelated."""\n')
+    monkeypatch.syspath_prepend(str(tmp_path / "src"))
+    plugin._reloaders.clear()
+    plugin._rendered.clear()
+    plugin._page_files.clear()
+    plugin._source_mtimes.clear()
+    yield package_dir
+    for name in list(sys.modules):
+        if name.split(".")[0] == "watched":
+            del sys.modules[name]
+
+
+def _rebuild(tmp_path, details):
+    """
+    Build the docs the way `mkdocs serve` does after a change, with a new
+    plugin, and get the modules whose pages were kept from the last build.
+    """
+    docs_plugin = plugin.Plugin()
+    errors, warnings = docs_plugin.load_config(
+        dict(modules=dict(watched=dict(section="watched", **details)))
+    )
+    assert not errors
+    config = dict(
+        site_dir=str(tmp_path / "site"),
+        nav=None,
+        config_file_path=str(tmp_path / "mkdocs.yml"),
+    )
+    docs_plugin.on_config(config)
+    kept = {key[0] for key in plugin._rendered}
+    pages = {
+        f.url: docs_plugin.on_page_read_source(types.SimpleNamespace(url=f.url))
+        for f in docs_plugin.on_files([])
+    }
+    docs_plugin.on_post_build(config)
+    return kept, pages
+
+
+@pytest.mark.parametrize("details", [{}, dict(static=True), dict(timeout=60)])
+def test_changed_files_only_rerender_the_pages_drawn_from_them(watched, details):
+    details = dict(source_repo="https://src", **details)
+    tmp_path = watched.parent.parent
+    assert _rebuild(tmp_path, details)[0] == set()
+    assert _rebuild(tmp_path, details)[0] == {
+        "watched",
+        "watched.core",
+        "watched.uses",
+        "watched.other",
+    }
+    core = watched / "core.py"
+    mtime = os.stat(core).st_mtime_ns
+    core.write_text(core.read_text().replace("one", "two"))
+    os.utime(core, ns=(mtime + 10**9, mtime + 10**9))
+
+    kept, pages = _rebuild(tmp_path, details)
+
+    # uses.py inherits from core.py, so its page is drawn from both
+    assert kept == {"watched", "watched.other"}
+    assert "Version two." in pages["watched/watched/core/"]
@@ -0,0 +1,85 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+from mktheapidocs.reloader import ModuleReloader
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    package_dir = tmp_path / "src" / "reloadpkg"
+    package_dir.mkdir(parents=True)
+    (package_dir / "__init__.py").write_text('"""A package."""\n')
+    (package_dir / "core.py").write_text("def f():\n    return 1\n")
+    (package_dir / "uses.py").write_text("from .core import f\n")
+    (package_dir / "usesuses.py").write_text("from .uses import f as g\n")
+    (package_dir / "other.py").write_text("def h():\n    return 2\n")
+    monkeypatch.syspath_prepend(str(tmp_path / "src"))
+    for name in ("core", "uses", "usesuses", "other"):
+        importlib.import_module(f"reloadpkg.{name}")
+    yield package_dir
+    for name in list(sys.modules):
+        if name.split(".")[0] == "reloadpkg":
+            del sys.modules[name]
+
+
+def _edit(path, source):
+    mtime = os.stat(path).st_mtime_ns
+    path.write_text(source)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+def test_first_refresh_only_records(package):
+    reloaded = []
+    reloader = ModuleReloader("reloadpkg", reload=reloaded.append)
+
+    assert reloader.refresh() == set()
+    assert reloaded == []
+    assert reloader.changed_files == set()
+
+
+def test_dependents_of_a_changed_module_are_reloaded(package):
+    reloader = ModuleReloader("reloadpkg")
+    reloader.refresh()
+    _edit(package / "core.py", "def f():\n    return 3\n")
+
+    # The package holds its submodules, so counts as depending on them
+    assert reloader.refresh() == {
+        "reloadpkg",
+        "reloadpkg.core",
+        "reloadpkg.uses",
+        "reloadpkg.usesuses",
+    }
+    assert reloader.changed_files == {str(package / "core.py")}
+    assert sys.modules["reloadpkg.usesuses"].g() == 3
+    assert reloader.refresh() == set()
+
+
+def test_dependencies_are_reloaded_first(package):
+    reloaded = []
+    reloader = ModuleReloader(
+        "reloadpkg",
+        reload=lambda module: reloaded.append(module.__name__),
+    )
+    reloader.refresh()
+    _edit(package / "core.py", "def f():\n    return 3\n")
+    _edit(package / "usesuses.py", "from .uses import f as h\n")
+
+    reloader.refresh()
+
+    assert reloaded.index("reloadpkg.core") < reloaded.index("reloadpkg.uses")
+    assert reloaded.index("reloadpkg.uses") < reloaded.index("reloadpkg.usesuses")
+    assert reloaded.index("reloadpkg.usesuses") < reloaded.index("reloadpkg")
+    assert "reloadpkg.other" not in reloaded
+
+
+def test_only_named_modules_are_checked(package):
+    reloader = ModuleReloader("reloadpkg")
+    reloader.refresh()
+    _edit(package / "core.py", "def f():\n    return 3\n")
+    _edit(package / "other.py", "def h():\n    return 4\n")
+
+    assert reloader.refresh({"reloadpkg.other"}) == {"reloadpkg", "reloadpkg.other"}
+    assert reloader.changed_files == {str(package / "other.py")}
@@ -0,0 +1,35 @@
+from mktheapidocs.schedule import Scheduled, Scheduler
+
+
+def _drain(scheduler, worker):
+    return list(Scheduled(scheduler, worker))
+
+
+def test_items_are_dealt_out_most_expensive_first():
+    scheduler = Scheduler(list("abcdef"), [1, 5, 3, 5, 2, 8], 2)
+
+    # Equal costs keep their order, so b is dealt out before d
+    assert [scheduler.next(0) for _ in range(3)] == ["f", "c", "a"]
+    assert [scheduler.next(1) for _ in range(3)] == ["b", "d", "e"]
+    assert scheduler.next(0) is None
+    assert scheduler.stolen() == 0
+
+
+def test_idle_workers_steal_the_cheapest_item_of_the_busiest():
+    scheduler = Scheduler(list("abcdef"), [6, 5, 4, 3, 2, 1], 3)
+    assert scheduler.next(0) == "a"
+    # Once its own c and d are done, worker 2 takes from worker 1, which has
+    # the most left, then from worker 0
+    assert _drain(scheduler, 2) == ["c", "d", "e", "b", "f"]
+    assert scheduler.stolen() == 3
+    assert scheduler.next(0) is None
+    assert scheduler.next(1) is None
+
+
+def test_every_item_is_done_once():
+    items = list(range(20))
+    scheduler = Scheduler(items, [item % 7 for item in items], 4)
+
+    done = [item for worker in (3, 0, 1, 2) for item in _drain(scheduler, worker)]
+
+    assert sorted(done) == items
@@ -0,0 +1,102 @@
+import contextlib
+import io
+
+import pytest
+
+from mktheapidocs import mkapi, shard
+
+MODULE = '''
+"""
+Module number {number}.
+"""
+
+
+class Thing{number}:
+    """
+    A thing.
+
+    Parameters
+    ----------
+    x : int
+        A number
+    """
+
+    def __init__(self, x):
+        self.x = x
+
+
+def make_{number}(x):
+    """
+    Make a thing.
+
+    Parameters
+    ----------
+    x : int
+        A number
+
+    Returns
+    -------
+    Thing{number}
+    """
+    return Thing{number}(x)
+'''
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    package_dir = tmp_path / "src" / "shardedpkg"
+    (package_dir / "sub").mkdir(parents=True)
+    (package_dir / "__init__.py").write_text('"""A package."""\n')
+    (package_dir / "sub" / "__init__.py").write_text('"""A subpackage."""\n')
+    for number in range(7):
+        module_dir = package_dir if number % 2 else package_dir / "sub"
+        (module_dir / f"mod{number}.py").write_text(MODULE.format(number=number))
+    monkeypatch.syspath_prepend(str(tmp_path / "src"))
+    return tmp_path
+
+
+def _docs(output_dir):
+    return {
+        str(path.relative_to(output_dir)): path.read_text()
+        for path in output_dir.rglob("*")
+        if path.is_file() and path.name != shard.SHARD_MANIFEST_NAME
+    }
+
+
+def test_merged_shards_match_a_single_build(package):
+    with contextlib.redirect_stdout(io.StringIO()):
+        mkapi.make_api_doc("shardedpkg", package / "single", "https://src")
+        shard_dirs = [package / f"shard{number}" for number in range(1, 4)]
+        for number, shard_dir in enumerate(shard_dirs, 1):
+            mkapi.make_api_doc(
+                "shardedpkg", shard_dir, "https://src", shard_of=(number, 3)
+            )
+        mkapi.merge_shards(package / "merged", shard_dirs)
+
+    assert all(_docs(shard_dir) for shard_dir in shard_dirs)
+    assert _docs(package / "merged") == _docs(package / "single")
+
+
+def test_shards_must_all_be_merged(package):
+    with contextlib.redirect_stdout(io.StringIO()):
+        shard_dirs = [package / f"shard{number}" for number in range(1, 4)]
+        for number, shard_dir in enumerate(shard_dirs, 1):
+            mkapi.make_api_doc(
+                "shardedpkg", shard_dir, "https://src", shard_of=(number, 3)
+            )
+        with pytest.raises(ValueError, match="Expected shards 1 to 3"):
+            mkapi.merge_shards(package / "merged", shard_dirs[:2])
+
+
+def test_partition_is_balanced_and_deterministic():
+    names = [f"pkg.mod{number}" for number in range(10)]
+    weights = {"pkg.mod0": 9.0, "pkg.mod1": 5.0, "pkg.mod2": 4.0}
+
+    parts = shard.partition(names, 3, weights)
+
+    assert shard.partition(reversed(names), 3, weights) == parts
+    assert sorted(name for part in parts for name in part) == sorted(names)
+    # Unweighted modules cost the mean of the weighted ones
+    loads = [sum(weights.get(name, 6.0) for name in part) for part in parts]
+    assert max(loads) - min(loads) <= 6.0
+    assert parts[0][0] == "pkg.mod0"
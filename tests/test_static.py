@@ -0,0 +1,50 @@
+import contextlib
+import io
+import textwrap
+
+from mktheapidocs import mkapi
+
+LAZY = '''
+"""
+Some attributes are only made when they're asked for.
+"""
+
+
+def documented(x):
+    """
+    Something to document.
+
+    Parameters
+    ----------
+    x : int
+        A number
+    """
+
+
+def __getattr__(name):
+    raise AttributeError(name)
+
+
+def __dir__():
+    return ["documented"]
+'''
+
+
+def test_module_getattr_and_dir_are_left_out(tmp_path, monkeypatch):
+    package_dir = tmp_path / "src" / "hookpkg"
+    package_dir.mkdir(parents=True)
+    (package_dir / "__init__.py").write_text(
+        '"""A package."""\nfrom .lazy import documented, made_later\n'
+    )
+    (package_dir / "lazy.py").write_text(textwrap.dedent(LAZY))
+    monkeypatch.syspath_prepend(str(tmp_path / "src"))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mkapi.make_api_doc(
+            "hookpkg", tmp_path / "docs", "https://src", static=True, cache_dir=None
+        )
+
+    lazy = (tmp_path / "docs" / "hookpkg" / "lazy.md").read_text()
+    assert "## documented" in lazy
+    assert "__getattr__" not in lazy
+    assert "__dir__" not in lazy